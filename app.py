@@ -1,33 +1,86 @@
-from fastapi import FastAPI
-import requests
+from fastapi import Body, FastAPI, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+import asyncio
+import os
 import sqlite3
+import time
 import uvicorn  # Added to fix the NameError
+from contextlib import nullcontext
+from typing import List
+from urllib.parse import quote
+from db_pool import DB_PATH, init_database, pool
+from encoders import ENCODERS, MEDIA_TYPES, columnar, dumps, iter_encoded, negotiate
+from index_advisor import advisor
+from intent_matcher import matcher
+from materialize import materializer
+from metrics import SamplingProfiler, metrics
+from schema_catalog import catalog
+from sql_guard import guard
+from llm_client import LLMClient
+from query_cache import LRUCache, ResultCache, normalize_question
+from streaming import stream_rows, streams
 
 # Create the FastAPI app
 app = FastAPI()
 
-# Function to get database schema for a specific table
+# Two-tier cache for repeated questions:
+# normalized question -> cleaned SQL (skips the Together AI call), cleaned SQL -> result rows (skips SQLite).
+# The result tier is emptied automatically whenever combined.db changes.
+sql_cache = LRUCache(max_size=512, ttl=3600)
+result_cache = ResultCache(DB_PATH, max_size=256, ttl=600, max_rows=10000)
+
+# Function to get database schema for a specific table (prebuilt by the schema catalog)
 def get_schema_info(table_name):
-    conn = sqlite3.connect("combined.db")
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name});")
-    columns = [row[1] for row in cursor.fetchall()]
-    conn.close()
-    return f"Table: {table_name}\nColumns: {', '.join(columns)}\n"
-
-# Function to execute the SQL query on a specific table in combined.db
-def execute_query(sql, table_name):
-    conn = sqlite3.connect("combined.db")
-    cursor = conn.cursor()
+    return catalog.fragment(table_name)
+
+# Function to execute the SQL query on a specific table in combined.db.
+# The SQL must pass the guard first (single read-only SELECT, affordable plan); it then runs with a
+# LIMIT, a time budget and a row cap, and the result says whether rows were cut off.
+# Pass conn to run on a connection the caller already holds (e.g. inside a batch's read transaction); its snapshot
+# may be older than the database file, so the materializer and guard then skip their per-version caches.
+def execute_query(sql, table_name, params=(), conn=None):
+    snapshot = conn is not None
+    # Validation and the plan check are one "guard" observation; the summary-table rewrite between them is timed apart
+    started = time.perf_counter()
+    checked = guard.validate(sql)
+    guard_seconds = time.perf_counter() - started
+    if "error" in checked:
+        metrics.observe("guard", guard_seconds)
+        return checked
     try:
-        cursor.execute(sql)
-        results = cursor.fetchall()  # Get all rows
-        column_names = [desc[0] for desc in cursor.description]  # Get column names
-        conn.close()
-        return {"columns": column_names, "data": results}
+        with nullcontext(conn) if conn is not None else pool.connection() as conn:
+            with metrics.stage("rewrite"):
+                # Rollups over a fresh, verified summary table read that instead of the base table
+                run_sql, view = materializer.rewrite(conn, checked["sql"], snapshot)
+            started = time.perf_counter()
+            assessment = guard.assess(conn, run_sql, params, snapshot)
+            metrics.observe("guard", guard_seconds + time.perf_counter() - started)
+            if "error" in assessment:
+                return assessment
+            started = time.perf_counter()
+            with guard.budget(conn):
+                cursor = conn.execute(run_sql, params)
+                results = cursor.fetchmany(guard.max_rows + 1)  # Get at most max_rows rows (+1 to detect more)
+                column_names = [desc[0] for desc in cursor.description]  # Get column names
+                cursor.close()
+            elapsed = time.perf_counter() - started
+            metrics.observe("sqlite_execute", elapsed)
+            metrics.slow_query(sql, params, elapsed, plan=assessment["plan"], executed_sql=run_sql)
+            advisor.record(sql, params, elapsed)
+    except sqlite3.OperationalError as e:
+        if str(e) == "interrupted":
+            return guard.budget_error()
+        return {"error": f"SQLite Error: {str(e)}"}
     except sqlite3.Error as e:
-        conn.close()
         return {"error": f"SQLite Error: {str(e)}"}
+    query_result = {"columns": column_names, "data": results[:guard.max_rows]}
+    if len(results) > guard.max_rows:
+        query_result["truncated"] = True
+    if assessment["warnings"]:
+        query_result["warnings"] = assessment["warnings"]
+    if view is not None:
+        query_result["materialized"] = view
+    return query_result
 
 # Function to clean up the SQL query
 def clean_sql_query(text):
@@ -47,30 +100,41 @@ def clean_sql_query(text):
         text = text.replace("where product =", "where product = '").replace(";", "'")
     return text
 
-# API call settings (your Together AI setup)
-url = "https://api.together.xyz/inference"
+# API call settings (your Together AI setup); TOGETHER_API_URL can point at a local stub for testing
+url = os.environ.get("TOGETHER_API_URL", "https://api.together.xyz/inference")
 headers = {
     "accept": "application/json",
     "content-type": "application/json",
     "Authorization": "Bearer API KEY"
 }
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "30"))  # Seconds per Together AI call
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "8"))  # In-flight Together AI calls
+
+STREAM_BATCH_SIZE = 500  # Rows per frame on /query/stream
+STREAM_MAX_ROWS = 100000  # Hard cap on rows sent by /query/stream
+
+BATCH_MAX_QUESTIONS = int(os.environ.get("BATCH_MAX_QUESTIONS", "100"))  # Questions accepted per /query/batch call
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))  # Generations in flight per batch
+
+# Shared async HTTP client for the /query endpoint (opened at startup)
+llm_client = LLMClient(url, headers, max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT)
+
+# Component counters exported as gauges on /metrics
+metrics.add_collector("pool", pool.stats)
+metrics.add_collector("sql_cache", sql_cache.stats)
+metrics.add_collector("result_cache", result_cache.stats)
+metrics.add_collector("llm", llm_client.stats)
+metrics.add_collector("guard", guard.stats)
+metrics.add_collector("streams", streams.stats)
 
-# Function to generate and execute SQL query (adapted from backend.py for simplicity)
-def generate_and_execute_sql(user_query):
-    # Determine which table to use based on the query
-    use_sales = any(keyword in user_query.lower() for keyword in ["sales", "revenue", "region", "sale"])
-    use_orders = any(keyword in user_query.lower() for keyword in ["orders", "order", "amount", "product"])
-
-    # Get schema info for relevant tables
-    schemas = ""
-    if use_sales:
-        schemas += get_schema_info("sales") + "\n"
-    if use_orders:
-        schemas += get_schema_info("orders") + "\n"
-    if not schemas:
-        schemas = get_schema_info("sales") + "\n" + get_schema_info("orders") + "\n"  # Default to both
+# Function to build the Together AI prompt for a user query
+def build_prompt(user_query):
+    # Get the prebuilt schema text for the tables the query is about (all tables if none match)
+    with metrics.stage("schema_lookup"):
+        schemas = catalog.schema_prompt(user_query)
 
     # Build the prompt with focused SQLite-specific rules for both tables, matching your previous structure
+    started = time.perf_counter()
     prompt = (
         f"You are an SQL expert for SQLite. Convert the user's request into a valid SQLite query based on these database schemas, outputting ONLY the SQL query itself—NO explanations, comments, descriptions, or additional text of any kind (e.g., no 'To determine...', no notes, just the SQL query ending with a semicolon).\n\n"
         f"{schemas}\n"
@@ -103,9 +167,12 @@ def generate_and_execute_sql(user_query):
         f"- User: 'Total sales table?' → select sum(revenue) as total_sales from sales;\n"
         f"- User: 'Product and revenue?' → select distinct s.customer_name, s.revenue, o.product from sales s join orders o on s.customer_name = o.customer_name;\n"
     )
+    metrics.observe("prompt_build", time.perf_counter() - started)
+    return prompt
 
-    # API payload with your original parameters
-    payload = {
+# Function to build the API payload with your original parameters
+def build_payload(prompt):
+    return {
         "model": "mistralai/Mixtral-8x7B-Instruct-v0.1",
         "prompt": f"<s>[INST] {prompt} [/INST>",
         "max_tokens": 512,
@@ -117,46 +184,378 @@ def generate_and_execute_sql(user_query):
         "n": 1
     }
 
-    # Make the API call
-    response = requests.post(url, json=payload, headers=headers)
-
-    # Process the response
-    if response.status_code == 200:
-        result = response.json()
-        choices = result.get("output", {}).get("choices", [])
-        if choices:
-            raw_query = choices[0].get("text", "").strip()
-            cleaned_query = clean_sql_query(raw_query)
-            try:
-                # Determine the table(s) based on the query
-                if "join" in cleaned_query.lower():
-                    # Handle queries spanning both tables (e.g., "product and revenue" or product-based with revenue)
-                    query_result = execute_query(cleaned_query, "sales")  # Use sales as the primary table for joins
-                else:
-                    # Determine the table based on the query
-                    table_used = "sales" if any(t in cleaned_query.lower() for t in ["sales", "revenue", "region", "sale"]) else "orders"
-                    query_result = execute_query(cleaned_query, table_used)
-                
-                if "error" in query_result:
-                    return {"sql": cleaned_query, "error": query_result["error"]}
-                return {
-                    "sql": cleaned_query,
-                    "results": {
-                        "columns": query_result["columns"],
-                        "data": query_result["data"]
-                    }
-                }
-            except sqlite3.Error as e:
-                return {"sql": cleaned_query, "error": f"SQLite Error: {str(e)}"}
+# Function to turn a successful API response into the cleaned SQL (or an error dict)
+def parse_llm_response(result):
+    choices = result.get("output", {}).get("choices", [])
+    if not choices:
+        return {"error": "No choices found in the response."}
+    raw_query = choices[0].get("text", "").strip()
+    with metrics.stage("clean_sql"):
+        return {"sql": clean_sql_query(raw_query)}
+
+# Function to get the cleaned SQL for a user query: from a local template, from the cache, or from Together AI.
+# The LLM call goes through the shared HTTP client (keep-alive, concurrency limit, timeout, identical in-flight
+# questions coalesced).
+async def generate_sql_async(user_query):
+    # Product lookups reload the distinct products from SQLite after a write, so templates are matched off the event loop
+    matched = await asyncio.to_thread(matcher.match, user_query)
+    if matched is not None:
+        metrics.inc("sql_source_total", source="template")
+        return {"sql": matched["sql"], "params": matched["params"], "cache_key": None}
+
+    cache_key = normalize_question(user_query)
+    cached_query = sql_cache.get(cache_key)
+    if cached_query is not None:
+        metrics.inc("sql_source_total", source="cache")
+        return {"sql": cached_query, "params": [], "cache_key": cache_key}
+
+    # Schema lookups touch SQLite, so the prompt is built off the event loop
+    prompt = await asyncio.to_thread(build_prompt, user_query)
+    metrics.inc("sql_source_total", source="llm")
+    with metrics.stage("llm_call"):
+        response = await llm_client.complete(cache_key, build_payload(prompt))
+    if "error" in response:
+        return {"error": response["error"]}
+    generated = parse_llm_response(response["result"])
+    if "error" not in generated:
+        sql_cache.set(cache_key, generated["sql"])
+        generated.update(params=[], cache_key=cache_key)
+    return generated
+
+# Function to generate and execute the SQL for a user query (the /query endpoint and the benchmarks);
+# the SQLite work runs in a worker thread so the event loop is never blocked
+async def generate_and_execute_sql_async(user_query):
+    generated = await generate_sql_async(user_query)
+    if "error" in generated:
+        return generated
+    return await asyncio.to_thread(run_query, generated["sql"], generated["cache_key"], generated["params"])
+
+# Function to execute a cleaned SQL query, reusing cached results while combined.db is unchanged.
+# With conn (a caller's read transaction), pass snapshot_version, the database version the snapshot was pinned at:
+# the cache is then only used while the database is still at that version, and not at all when it is None.
+def run_query(cleaned_query, cache_key=None, params=(), conn=None, snapshot_version=None):
+    # Template queries carry their values separately; they are part of the result cache key and the response
+    result_key = (cleaned_query, tuple(params)) if params else cleaned_query
+    response = {"sql": cleaned_query, "params": list(params)} if params else {"sql": cleaned_query}
+    use_cache = conn is None or snapshot_version is not None
+    if use_cache:
+        cached_result = result_cache.get(result_key, version=snapshot_version)
+        if cached_result is not None:
+            return dict(response, results=cached_result)
+
+    version = result_cache.current_version() if conn is None else snapshot_version
+    try:
+        # Determine the table(s) based on the query
+        if "join" in cleaned_query.lower():
+            # Handle queries spanning both tables (e.g., "product and revenue" or product-based with revenue)
+            query_result = execute_query(cleaned_query, "sales", params, conn)  # Use sales as the primary table for joins
         else:
-            return {"error": "No choices found in the response."}
+            # Determine the table based on the query
+            table_used = "sales" if any(t in cleaned_query.lower() for t in ["sales", "revenue", "region", "sale"]) else "orders"
+            query_result = execute_query(cleaned_query, table_used, params, conn)
+
+        if "error" in query_result:
+            # Don't keep serving SQL that fails; the next ask goes back to the LLM
+            if cache_key is not None:
+                sql_cache.pop(cache_key)
+            error = {key: query_result[key] for key in ("error", "error_type", "details") if key in query_result}
+            return dict(response, **error)
+        results = {
+            "columns": query_result["columns"],
+            "data": query_result["data"]
+        }
+        for key in ("truncated", "warnings", "materialized"):
+            if key in query_result:
+                results[key] = query_result[key]
+        if use_cache:
+            result_cache.set(result_key, results, version=version)
+        return dict(response, results=results)
+    except sqlite3.Error as e:
+        return dict(response, error=f"SQLite Error: {str(e)}")
+
+QUERY_FORMATS = ("json", "columnar", "csv", "arrow")
+STREAM_FORMATS = ("ndjson", "csv", "arrow")
+
+# Function to check a requested output format; returns a 406 error response, or None when it can be served
+def format_error(output_format, allowed):
+    if output_format == "arrow" and "arrow" not in ENCODERS:
+        message = "Arrow output needs pyarrow, which is not installed."
+    elif output_format not in allowed:
+        message = f"Unsupported format; use one of: {', '.join(allowed)}."
     else:
-        return {"error": f"API Error: {response.status_code}\n{response.text}"}
+        return None
+    return Response(content=dumps({"error": message}), media_type=MEDIA_TYPES["json"], status_code=406)
+
+# Download headers for CSV/Arrow responses; the SQL goes in a header since the body is just the table
+def table_headers(encoder, sql, truncated=False):
+    headers = {
+        "Content-Disposition": f'attachment; filename="query.{encoder.extension}"',
+        "X-SQL-Query": quote(sql),
+    }
+    if truncated:
+        headers["X-Truncated"] = "true"
+    return headers
 
-# Define the endpoint (matching your previous /generate-sql/ but renamed to /query for consistency)
+# Function to encode a /query result in the negotiated format. Errors always come back as the JSON error body.
+# The rows are already in memory (at most the guard's row cap), so CSV/Arrow is encoded here in full: the column
+# types are taken from every row, and a value that can't be encoded still gets a JSON error instead of a cut-off body.
+def encode_result(result, output_format):
+    if "error" in result or output_format == "json":
+        return Response(content=dumps(result), media_type=MEDIA_TYPES["json"])
+    if output_format == "columnar":
+        return Response(content=dumps(dict(result, results=columnar(result["results"]))),
+                        media_type=MEDIA_TYPES["columnar"])
+    results = result["results"]
+    encoder = ENCODERS[output_format](results["columns"], catalog.column_types(result["sql"], results["columns"]))
+    try:
+        body = b"".join(iter_encoded(encoder, results["data"]))
+    except ValueError as e:
+        return Response(content=dumps(dict(result, results=None, error=f"Encoding Error: {str(e)}")),
+                        media_type=MEDIA_TYPES["json"])
+    return Response(content=body, media_type=encoder.media_type,
+                    headers=table_headers(encoder, result["sql"], results.get("truncated", False)))
+
+# Define the endpoint (matching your previous /generate-sql/ but renamed to /query for consistency).
+# The result format comes from ?format= or the Accept header: json (rows), columnar (column arrays), csv or arrow.
 @app.get("/query")
-def process_query(query: str):
-    return generate_and_execute_sql(query)
+async def process_query(query: str, request: Request, output_format: str = Query(None, alias="format")):
+    output_format = negotiate(output_format, request.headers.get("accept")) or output_format
+    error = format_error(output_format, QUERY_FORMATS)
+    if error is not None:
+        return error
+    with metrics.stage("total"):
+        result = await generate_and_execute_sql_async(query)
+        # Serialized here rather than by FastAPI so the time shows up as its own stage
+        with metrics.stage("serialize"):
+            return encode_result(result, output_format)
+
+# Function to run the generated SQL of a batch on one pooled connection inside one read transaction,
+# so every answer comes from the same snapshot of combined.db. Generation errors are passed through in place.
+# Cached results are only shared with the batch when no write landed while the snapshot was being pinned.
+def run_batch(generated):
+    answers = []
+    with pool.connection() as conn:
+        version = result_cache.current_version()
+        conn.execute("begin")
+        try:
+            conn.execute("select count(*) from sqlite_master").fetchone()  # BEGIN is deferred; this read pins the snapshot
+            snapshot_version = version if result_cache.current_version() == version else None
+            for item in generated:
+                if "error" in item:
+                    answers.append(item)
+                else:
+                    answers.append(run_query(item["sql"], item["cache_key"], item["params"], conn, snapshot_version))
+        finally:
+            conn.rollback()
+    return answers
+
+# Batch version of /query for reporting jobs: {"questions": [...]} -> {"results": [...]} in input order.
+# Questions that normalize to the same text are answered once; SQL generation runs concurrently
+# (at most BATCH_CONCURRENCY at a time) and all SQL then runs in a single read transaction.
+@app.post("/query/batch")
+async def process_query_batch(questions: List[str] = Body(..., embed=True)):
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        message = f"Too many questions ({len(questions)}); the limit is {BATCH_MAX_QUESTIONS} per batch."
+        return Response(content=dumps({"error": message}), media_type=MEDIA_TYPES["json"], status_code=413)
+    unique = {}
+    for question in questions:
+        unique.setdefault(normalize_question(question), question)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def generate(question):
+        async with semaphore:
+            return await generate_sql_async(question)
+
+    generated = await asyncio.gather(*(generate(question) for question in unique.values()), return_exceptions=True)
+    generated = [{"error": f"Error: {str(item)}"} if isinstance(item, Exception) else item for item in generated]
+    try:
+        answers = await asyncio.to_thread(run_batch, generated)
+    except sqlite3.Error as e:
+        answers = [{"error": f"SQLite Error: {str(e)}"}] * len(generated)
+    by_question = dict(zip(unique, answers))
+    results = [dict(by_question[normalize_question(question)], question=question) for question in questions]
+    with metrics.stage("serialize"):
+        body = dumps({"results": results, "unique_questions": len(unique)})
+    return Response(content=body, media_type=MEDIA_TYPES["json"])
+
+# Streaming version of /query: one NDJSON frame with the SQL and columns, then rows in batches as SQLite
+# produces them, then a summary frame. Rows past max_rows are not sent; the query is interrupted if the client goes away.
+# With format=csv or format=arrow (or that Accept type) the rows are encoded batch by batch straight from the cursor
+# into a CSV or Arrow IPC stream instead, for downloads.
+@app.get("/query/stream")
+async def process_query_stream(query: str, request: Request, batch_size: int = STREAM_BATCH_SIZE, max_rows: int = STREAM_MAX_ROWS,
+                               output_format: str = Query(None, alias="format")):
+    if output_format is None:
+        output_format = negotiate(None, request.headers.get("accept"))
+        output_format = output_format if output_format in ENCODERS else "ndjson"
+    error = format_error(output_format.lower(), STREAM_FORMATS)
+    if error is not None:
+        return error
+    output_format = output_format.lower()
+    if not streams.has_capacity():
+        message = f"Too many downloads in progress (limit {streams.max_streams}); try again shortly."
+        return Response(content=dumps({"error": message}), media_type=MEDIA_TYPES["json"], status_code=503,
+                        headers={"Retry-After": "5"})
+    generated = await generate_sql_async(query)
+    batch_size = max(1, min(batch_size, STREAM_BATCH_SIZE * 10))
+    max_rows = max(0, min(max_rows, STREAM_MAX_ROWS))
+
+    if "error" in generated:
+        failure = {"error": generated["error"]}
+    else:
+        sql, params = generated["sql"], generated["params"]
+        header = {"sql": sql, "params": params} if params else {"sql": sql}
+        # Same read-only and cost checks as /query; the row cap here is max_rows instead of a LIMIT
+        checked = await asyncio.to_thread(guard.check, sql, params)
+        failure = None
+        if "error" in checked:
+            failure = dict(header, **{key: checked[key] for key in ("error", "error_type", "details") if key in checked})
+        elif checked["warnings"]:
+            header["warnings"] = checked["warnings"]
+    if failure is not None:
+        if output_format == "ndjson":
+            return StreamingResponse(iter([dumps(failure) + b"\n"]), media_type="application/x-ndjson")
+        return Response(content=dumps(failure), media_type=MEDIA_TYPES["json"])
+
+    def failed():
+        if generated["cache_key"] is not None:
+            sql_cache.pop(generated["cache_key"])
+
+    async def frames():
+        async for kind, value in stream_rows(checked["sql"], batch_size, max_rows, params=params,
+                                             is_disconnected=request.is_disconnected, time_budget=guard.time_budget):
+            if kind == "columns":
+                yield dumps(dict(header, columns=value)) + b"\n"
+            elif kind == "rows":
+                yield dumps({"rows": value}) + b"\n"
+            elif kind == "done":
+                yield dumps(dict(value, done=True)) + b"\n"
+            else:
+                if kind == "error":
+                    failed()
+                yield dumps(dict(header, **value)) + b"\n"
+
+    # A failure after the first bytes can't change the status any more. Raising aborts the connection before the
+    # closing chunk, so the client sees a failed download instead of a short file that looks complete.
+    async def table_chunks():
+        encoder = None
+        async for kind, value in stream_rows(checked["sql"], batch_size, max_rows, params=params,
+                                             is_disconnected=request.is_disconnected, time_budget=guard.time_budget):
+            if kind == "columns":
+                encoder = ENCODERS[output_format](value, catalog.column_types(sql, value))
+                yield encoder.begin()
+            elif kind == "rows":
+                try:
+                    chunk = encoder.encode(value)
+                except ValueError as e:
+                    raise RuntimeError(f"{output_format} stream stopped: {str(e)}") from e
+                yield chunk
+            elif kind == "done":
+                yield encoder.end()
+            else:
+                if kind == "error":
+                    failed()
+                raise RuntimeError(f"{output_format} stream stopped: {value['error']}")
+
+    if output_format == "ndjson":
+        return StreamingResponse(frames(), media_type="application/x-ndjson")
+    encoder_class = ENCODERS[output_format]
+    return StreamingResponse(table_chunks(), media_type=encoder_class.media_type,
+                             headers=table_headers(encoder_class, sql))
+
+# Switch combined.db to WAL and open the read-only connection pool before the first request
+@app.on_event("startup")
+def open_connection_pool():
+    init_database(DB_PATH)
+    try:
+        pool.warm(4)
+        catalog.refresh()
+    except sqlite3.Error as e:
+        print(f"Could not open {DB_PATH}: {str(e)}")
+
+@app.on_event("shutdown")
+def close_connection_pool():
+    pool.close_all()
+
+# Keep one pooled HTTP client for Together AI for the life of the app
+@app.on_event("startup")
+async def open_llm_client():
+    await llm_client.start()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_client.aclose()
+
+# Per-stage latency histograms, token/slow query counters and component stats in the Prometheus text format
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Most recent queries over SLOW_QUERY_MS, with the plan they ran with
+@app.get("/metrics/slow")
+def slow_queries():
+    return {"threshold_ms": metrics.slow_query_seconds * 1000, "queries": metrics.slow_queries()}
+
+# Sample every thread's stack for `seconds` and return folded stacks (flamegraph.pl / speedscope input).
+# Off unless the app was started with ENABLE_PROFILER=1.
+@app.get("/debug/profile")
+async def sample_profile(seconds: float = 10.0, interval: float = 0.005):
+    if os.environ.get("ENABLE_PROFILER") != "1":
+        return {"error": "Profiler is disabled; start the app with ENABLE_PROFILER=1."}
+    profiler = SamplingProfiler(interval=max(0.001, interval))
+    profiler.start()
+    try:
+        await asyncio.sleep(max(0.1, min(seconds, 120.0)))
+    finally:
+        folded = profiler.stop()
+    return PlainTextResponse(folded)
+
+# Together AI client counters (calls, coalesced duplicates, timeouts)
+@app.get("/llm/stats")
+def llm_stats():
+    return llm_client.stats()
+
+# Index recommendations for the workload seen so far (created offline with `python index_advisor.py --apply`)
+@app.get("/indexes/advice")
+def index_advice():
+    with pool.connection() as conn:
+        recommendations = advisor.recommend(conn)
+    return {"workload": advisor.workload()[:20], "recommendations": recommendations}
+
+# SQL guard limits and rejection counters
+@app.get("/guard/stats")
+def guard_stats():
+    return guard.stats()
+
+# Local template (fast path) hit rate
+@app.get("/intents/stats")
+def intent_stats():
+    return matcher.stats()
+
+# Schema catalog size and refresh count
+@app.get("/schema/stats")
+def schema_stats():
+    return catalog.stats()
+
+# Summary tables currently used for rewriting
+@app.get("/materialize/stats")
+def materialize_stats():
+    return materializer.stats()
+
+# Connection pool utilization
+@app.get("/pool/stats")
+def pool_stats():
+    return pool.stats()
+
+# Active /query/stream downloads, refusals at the limit and idle timeouts
+@app.get("/stream/stats")
+def stream_stats():
+    return streams.stats()
+
+# Cache hit/miss counters for both tiers
+@app.get("/cache/stats")
+def cache_stats():
+    return {"sql_cache": sql_cache.stats(), "result_cache": result_cache.stats()}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,28 +1,23 @@
 import requests
 import sqlite3
+from db_pool import DB_PATH, init_database, pool
+from schema_catalog import catalog
 
-# Function to get database schema for a specific table
+# Function to get database schema for a specific table (prebuilt by the schema catalog)
 def get_schema_info(table_name):
-    conn = sqlite3.connect("combined.db")
-    cursor = conn.cursor()
-    cursor.execute(f"PRAGMA table_info({table_name});")
-    columns = [row[1] for row in cursor.fetchall()]
-    conn.close()
-    return f"Table: {table_name}\nColumns: {', '.join(columns)}\n"
+    return catalog.fragment(table_name)
 
 # Function to execute the SQL query on a specific table in combined.db
 def execute_query(sql, table_name):
-    conn = sqlite3.connect("combined.db")
-    cursor = conn.cursor()
     try:
-        cursor.execute(sql)
-        results = cursor.fetchall()
-        column_names = [desc[0] for desc in cursor.description]
+        with pool.connection() as conn:
+            cursor = conn.execute(sql)
+            results = cursor.fetchall()
+            column_names = [desc[0] for desc in cursor.description]
+            cursor.close()
         return {"columns": column_names, "data": results}
     except sqlite3.Error as e:
         return {"error": f"SQLite Error: {str(e)}"}
-    finally:
-        conn.close()
 
 # Function to clean up the SQL query
 def clean_sql_query(text):
@@ -43,18 +38,8 @@ def clean_sql_query(text):
     return text
 
 def generate_and_execute_sql(user_query):
-    # Determine which table to use based on the query
-    use_sales = any(keyword in user_query.lower() for keyword in ["sales", "revenue", "region", "sale"])
-    use_orders = any(keyword in user_query.lower() for keyword in ["orders", "order", "amount", "product"])
-
-    # Get schema info for relevant tables
-    schemas = ""
-    if use_sales:
-        schemas += get_schema_info("sales") + "\n"
-    if use_orders:
-        schemas += get_schema_info("orders") + "\n"
-    if not schemas:
-        schemas = get_schema_info("sales") + "\n" + get_schema_info("orders") + "\n"  # Default to both
+    # Get the prebuilt schema text for the tables the query is about (all tables if none match)
+    schemas = catalog.schema_prompt(user_query)
 
     # Build the prompt with focused SQLite-specific rules for both tables, ensuring quoted products in joins
     prompt = (
@@ -146,6 +131,7 @@ def generate_and_execute_sql(user_query):
         print(f"Error: {response.status_code}\n{response.text}")
 
 def main():
+    init_database(DB_PATH)
     while True:
         user_query = input("Enter your query (e.g., 'top 3 customers by revenue') or 'quit' to exit: ").strip()
         if user_query.lower() == 'quit':
@@ -0,0 +1,98 @@
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+# Synthetic combined.db generator: same sales/orders schema as the real database, any size.
+# Usage: python benchmarks/generate_data.py --rows 1000000 --output bench.db
+
+SALES_SCHEMA = """
+create table if not exists sales (
+    id integer primary key autoincrement,
+    customer_name text,
+    revenue real,
+    region text,
+    sale_date text
+)"""
+
+ORDERS_SCHEMA = """
+create table if not exists orders (
+    order_id integer primary key autoincrement,
+    customer_name text,
+    order_amount real,
+    product text,
+    order_date text
+)"""
+
+REGIONS = ["North", "South", "East", "West", "Central"]
+PRODUCTS = ["laptop", "monitor", "keyboard", "mouse", "tablet", "phone", "headphones", "printer", "webcam", "router"]
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Emma", "Frank", "Grace", "Henry", "Ivy", "Jack",
+               "Karen", "Liam", "Mia", "Noah", "Olivia", "Paul", "Quinn", "Ruby", "Sam", "Tina"]
+LAST_NAMES = ["Smith", "Jones", "Brown", "Taylor", "Wilson", "Davies", "Evans", "Thomas", "Roberts", "Walker"]
+
+# Function to build the customer list; it grows with the data so joins on customer_name stay selective
+def make_customers(rows, rng):
+    count = max(10, min(rows // 20, 100000))
+    names = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
+    customers = names[:count]
+    while len(customers) < count:
+        customers.append(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {len(customers)}")
+    return customers
+
+def _sales_rows(count, customers, rng, start):
+    for _ in range(count):
+        yield (rng.choice(customers), round(rng.uniform(10, 5000), 2), rng.choice(REGIONS),
+               (start + timedelta(days=rng.randrange(730))).isoformat())
+
+def _orders_rows(count, customers, rng, start):
+    for _ in range(count):
+        yield (rng.choice(customers), round(rng.uniform(5, 2500), 2), rng.choice(PRODUCTS),
+               (start + timedelta(days=rng.randrange(730))).isoformat())
+
+# Function to create (or overwrite) a database with `rows` rows in each of sales and orders
+def generate(output, rows, seed=42, batch_size=50000):
+    for path in (output, output + "-wal", output + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+    rng = random.Random(seed)
+    customers = make_customers(rows, rng)
+    start = date(2023, 1, 1)
+    conn = sqlite3.connect(output)
+    conn.execute("PRAGMA journal_mode=OFF;")  # Throwaway benchmark data, so skip the journal entirely
+    conn.execute("PRAGMA synchronous=OFF;")
+    conn.execute(SALES_SCHEMA)
+    conn.execute(ORDERS_SCHEMA)
+    for table, columns, source in (
+        ("sales", "customer_name, revenue, region, sale_date", _sales_rows(rows, customers, rng, start)),
+        ("orders", "customer_name, order_amount, product, order_date", _orders_rows(rows, customers, rng, start)),
+    ):
+        batch = []
+        for row in source:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.executemany(f"insert into {table} ({columns}) values (?, ?, ?, ?)", batch)
+                batch.clear()
+        if batch:
+            conn.executemany(f"insert into {table} ({columns}) values (?, ?, ?, ?)", batch)
+        conn.commit()
+    conn.execute("PRAGMA journal_mode=DELETE;")
+    conn.close()
+    return {"rows_per_table": rows, "customers": len(customers), "products": len(PRODUCTS)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a combined.db-shaped database for benchmarks.")
+    parser.add_argument("--rows", type=int, default=1000, help="rows per table (1e3 to 1e7)")
+    parser.add_argument("--output", default="bench.db")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    info = generate(args.output, args.rows, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.output}: {info['rows_per_table']} rows per table, {info['customers']} customers "
+          f"in {elapsed:.1f}s ({2 * args.rows / elapsed:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the Together AI /inference endpoint.
+# It answers with canned SQL picked from the user query in the prompt, after a configurable delay,
+# in the same response shape as the real API ({"output": {"choices": [{"text": ...}], "usage": {...}}}).
+# Usage: python benchmarks/mock_llm_server.py --port 8001 --latency 0.8 --jitter 0.2
+#        TOGETHER_API_URL=http://127.0.0.1:8001/inference uvicorn app:app
+
+CANNED_SQL = [
+    (r"region", "select region, sum(revenue) as total_revenue from sales group by region order by total_revenue desc;"),
+    (r"average order|avg", "select product, avg(order_amount) as avg_amount from orders group by product;"),
+    (r"per day|daily", "select sale_date, sum(revenue) as total_revenue from sales group by sale_date order by sale_date;"),
+    (r"product and revenue",
+     "select distinct s.customer_name, s.revenue, o.product from sales s join orders o on s.customer_name = o.customer_name;"),
+    (r"bought (\w+)",
+     "select distinct s.customer_name, s.revenue from sales s join orders o on s.customer_name = o.customer_name "
+     "where o.product = '{0}';"),
+    (r"top (\d+)",
+     "select customer_name, sum(revenue) as total_revenue from sales group by customer_name "
+     "order by total_revenue desc limit {0};"),
+    (r"orders", "select count(*) as total_orders from orders;"),
+]
+DEFAULT_SQL = "select count(*) as total_sales from sales;"
+
+# Function to pick the canned SQL for the "User Query:" line of the prompt
+def canned_sql(prompt):
+    found = re.search(r"User Query: (.*)", prompt)
+    question = found.group(1).lower() if found else ""
+    for pattern, sql in CANNED_SQL:
+        match = re.search(pattern, question)
+        if match:
+            return sql.format(*match.groups())
+    return DEFAULT_SQL
+
+def make_handler(latency, jitter, error_rate):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("content-length", 0)))
+            payload = json.loads(body or b"{}")
+            time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+            if error_rate and random.random() < error_rate:
+                self._send(500, {"error": "mock upstream error"})
+                return
+            text = canned_sql(payload.get("prompt", ""))
+            self._send(200, {
+                "output": {
+                    "choices": [{"text": text}],
+                    "usage": {
+                        "prompt_tokens": len(payload.get("prompt", "")) // 4,
+                        "completion_tokens": len(text) // 4,
+                    },
+                },
+            })
+
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass  # Keep benchmark output clean
+
+    return InferenceHandler
+
+# Function to start the mock server in a background thread; returns (server, url)
+def start_server(port=0, latency=0.5, jitter=0.0, error_rate=0.0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, jitter, error_rate))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/inference"
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Together AI /inference endpoint for benchmarks.")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(args.latency, args.jitter, args.error_rate))
+    print(f"Mock LLM listening on http://127.0.0.1:{args.port}/inference")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+# Benchmarks for the query pipeline; results are written as JSON so runs can be compared.
+# Usage:
+#   python benchmarks/run_benchmarks.py --rows 100000 --output results.json
+#   python benchmarks/run_benchmarks.py --rows 100000 --spawn-app --load-requests 2000 --concurrency 64
+#   python benchmarks/run_benchmarks.py --baseline old.json --output new.json   (exit code 1 on regressions)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate_data  # noqa: E402
+import mock_llm_server  # noqa: E402
+
+RAW_LLM_OUTPUTS = [
+    "SQL Query: select customer_name, sum(revenue) as total_revenue from sales group by customer_name "
+    "order by total_revenue desc limit 3;",
+    "```\nSELECT DISTINCT s.customer_name, s.revenue FROM sales s JOIN orders o ON s.customer_name = o.customer_name "
+    "WHERE o.product = 'monitor';\n```",
+    "select count(distinct customer_name) as total_customers from sales;",
+]
+
+EXECUTE_QUERIES = {
+    "count_distinct": "select count(distinct customer_name) as total_customers from sales",
+    "sum": "select sum(revenue) as total_sales from sales",
+    "top_customers": "select customer_name, sum(revenue) as total_revenue from sales group by customer_name "
+                     "order by total_revenue desc limit 5",
+    "by_region": "select region, sum(revenue) as total_revenue from sales group by region",
+    "filter": "select customer_name from sales where revenue > 4900",
+    "who_bought": "select distinct s.customer_name, s.revenue from sales s join orders o "
+                  "on s.customer_name = o.customer_name where o.product = 'monitor' limit 1000",
+}
+
+# Questions that go to the (mock) LLM, plus a few the local templates answer
+LLM_QUESTIONS = ["revenue by region", "average order amount per product", "revenue per day", "how many orders"]
+TEMPLATE_QUESTIONS = ["total customers", "top 5 customers by revenue", "who bought monitor"]
+
+def percentile(sorted_samples, q):
+    if not sorted_samples:
+        return None
+    index = min(len(sorted_samples) - 1, max(0, int(round(q / 100 * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+# Function to turn latency samples (seconds) into the JSON summary stored per benchmark
+def summarize(samples, elapsed, peak_bytes=None, errors=0):
+    ordered = sorted(samples)
+    summary = {
+        "count": len(samples),
+        "errors": errors,
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else None,
+        "p50_ms": percentile(ordered, 50) * 1000 if samples else None,
+        "p90_ms": percentile(ordered, 90) * 1000 if samples else None,
+        "p99_ms": percentile(ordered, 99) * 1000 if samples else None,
+        "max_ms": ordered[-1] * 1000 if samples else None,
+        "ops_per_sec": len(samples) / elapsed if elapsed else None,
+    }
+    if peak_bytes is not None:
+        summary["peak_memory_kb"] = peak_bytes / 1024
+    return summary
+
+# Function to time fn() `iterations` times, then run it once more under tracemalloc for peak memory
+def measure(fn, iterations, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        if fn() is False:
+            errors += 1
+        samples.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize(samples, elapsed, peak, errors)
+
+def bench_clean_sql(app, iterations):
+    def run():
+        for text in RAW_LLM_OUTPUTS:
+            app.clean_sql_query(text)
+    return {"clean_sql_query": measure(run, iterations * 10)}
+
+def bench_execute_query(app, iterations):
+    results = {}
+    for name, sql in EXECUTE_QUERIES.items():
+        results[f"execute_query.{name}"] = measure(lambda: "error" not in app.execute_query(sql, "sales"), iterations)
+    return results
+
+# End-to-end generate_and_execute_sql_async, the path /query runs: "cold" clears both cache tiers every call,
+# "warm" keeps them. One event loop serves every call, so the LLM client keeps its connections like the app does.
+def bench_end_to_end(app, iterations):
+    results = {}
+    loop = asyncio.new_event_loop()
+    for label, questions in (("llm", LLM_QUESTIONS), ("template", TEMPLATE_QUESTIONS)):
+        for cache in ("cold", "warm"):
+            position = [0]
+
+            def run():
+                if cache == "cold":
+                    app.sql_cache.clear()
+                    app.result_cache.clear()
+                question = questions[position[0] % len(questions)]
+                position[0] += 1
+                return "error" not in loop.run_until_complete(app.generate_and_execute_sql_async(question))
+
+            # Warm runs first ask every question once so each timed call is a cache hit
+            results[f"generate_and_execute_sql_async.{label}.{cache}"] = measure(
+                run, iterations, warmup=len(questions) if cache == "warm" else 1)
+    loop.run_until_complete(app.llm_client.aclose())
+    loop.close()
+    return results
+
+# Concurrent HTTP load against a running app.py (GET /query)
+def bench_http_load(base_url, total, concurrency, timeout=60):
+    questions = LLM_QUESTIONS + TEMPLATE_QUESTIONS
+
+    def one(i):
+        url = f"{base_url}/query?" + urllib.parse.urlencode({"query": questions[i % len(questions)]})
+        t0 = time.perf_counter()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                ok = response.status == 200 and "error" not in json.loads(response.read())
+        except Exception:
+            ok = False
+        return time.perf_counter() - t0, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    summary = summarize([latency for latency, _ in outcomes], elapsed, errors=sum(1 for _, ok in outcomes if not ok))
+    summary["concurrency"] = concurrency
+    return {"http_load": summary}
+
+# Function to start uvicorn app:app against the benchmark database and mock LLM; returns (process, base_url)
+def spawn_app(db_path, llm_url, port):
+    env = dict(os.environ, COMBINED_DB=os.path.abspath(db_path), TOGETHER_API_URL=llm_url)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{base_url}/pool/stats", timeout=1)
+            return process, base_url
+        except Exception:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("app.py did not start within 30s")
+
+# Function to list benchmarks whose p50 latency got worse than the baseline by more than `threshold`
+def compare(current, baseline, threshold):
+    regressions = []
+    for name, result in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old or not old.get("p50_ms") or result.get("p50_ms") is None:
+            continue
+        change = result["p50_ms"] / old["p50_ms"] - 1
+        if change > threshold:
+            regressions.append({"benchmark": name, "baseline_p50_ms": old["p50_ms"],
+                                "p50_ms": result["p50_ms"], "change": change})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQL Query Bot pipeline.")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per table in the generated database")
+    parser.add_argument("--db", help="use an existing database instead of generating one")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock LLM latency in seconds")
+    parser.add_argument("--only", help="comma-separated groups: clean,execute,e2e,http")
+    parser.add_argument("--app-url", help="base URL of an already running app.py for the HTTP load test")
+    parser.add_argument("--spawn-app", action="store_true", help="start app.py with uvicorn for the HTTP load test")
+    parser.add_argument("--app-port", type=int, default=8765)
+    parser.add_argument("--load-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown before flagging (0.2 = 20%%)")
+    args = parser.parse_args()
+    groups = set(args.only.split(",")) if args.only else {"clean", "execute", "e2e", "http"}
+
+    db_path = args.db
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="sqlbot-bench-"), "combined.db")
+        generate_data.generate(db_path, args.rows)
+    server, llm_url = mock_llm_server.start_server(latency=args.latency)
+
+    # app.py reads these at import time
+    os.environ["COMBINED_DB"] = os.path.abspath(db_path)
+    os.environ["TOGETHER_API_URL"] = llm_url
+    app = importlib.import_module("app")
+    app.open_connection_pool()
+
+    results = {}
+    if "clean" in groups:
+        results.update(bench_clean_sql(app, args.iterations))
+    if "execute" in groups:
+        results.update(bench_execute_query(app, args.iterations))
+    if "e2e" in groups:
+        results.update(bench_end_to_end(app, args.iterations))
+    if "http" in groups and (args.app_url or args.spawn_app):
+        process = None
+        base_url = args.app_url
+        if args.spawn_app:
+            process, base_url = spawn_app(db_path, llm_url, args.app_port)
+        try:
+            results.update(bench_http_load(base_url, args.load_requests, args.concurrency))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    server.shutdown()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "sqlite": app.sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "rows_per_table": None if args.db else args.rows,
+            "db": db_path,
+            "iterations": args.iterations,
+            "mock_llm_latency": args.latency,
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for name, result in results.items():
+        print(f"{name:50s} p50 {result['p50_ms']:9.3f} ms  p99 {result['p99_ms']:9.3f} ms  "
+              f"{result['ops_per_sec']:10.1f} ops/s  errors {result['errors']}")
+    print(f"Results written to {args.output}")
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression['benchmark']}: {regression['baseline_p50_ms']:.3f} ms -> "
+              f"{regression['p50_ms']:.3f} ms ({regression['change']:+.0%})")
+    if report.get("regressions"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
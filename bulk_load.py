@@ -0,0 +1,348 @@
+import argparse
+import csv
+import itertools
+import math
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+
+from db_pool import DB_PATH
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for Parquet input
+    pq = None
+
+# Bulk loader for combined.db: streams CSV/Parquet exports into sales/orders in chunks.
+# Each chunk is checked against the table schema and inserted with executemany; commits happen every
+# commit_rows rows, or once at the end when indexes are deferred. The database stays in WAL mode, so /query
+# readers keep their snapshot and are never blocked.
+# Usage: python bulk_load.py sales exports/sales_2024-06-01.csv [--db combined.db] [--chunk-size 50000]
+
+SALES_SCHEMA = """
+create table if not exists sales (
+    id integer primary key autoincrement,
+    customer_name text,
+    revenue real,
+    region text,
+    sale_date text
+)"""
+
+ORDERS_SCHEMA = """
+create table if not exists orders (
+    order_id integer primary key autoincrement,
+    customer_name text,
+    order_amount real,
+    product text,
+    order_date text
+)"""
+
+# Column name -> kind; "required" columns may not be empty
+TABLES = {
+    "sales": {"schema": SALES_SCHEMA, "id": "id",
+              "columns": {"customer_name": "text", "revenue": "real", "region": "text", "sale_date": "date"},
+              "required": ("customer_name", "revenue")},
+    "orders": {"schema": ORDERS_SCHEMA, "id": "order_id",
+               "columns": {"customer_name": "text", "order_amount": "real", "product": "text", "order_date": "date"},
+               "required": ("customer_name", "order_amount")},
+}
+
+# Deferring index builds pays off once a load adds about half the table's rows (measured on a 1M-row
+# sales table with one index: 50k rows 0.5s kept vs 2.0s rebuilt, 500k rows 3.4s kept vs 3.1s rebuilt)
+DEFER_INDEX_RATIO = 0.5
+
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+# Value converters by column kind; empty values become NULL, anything that doesn't fit raises ValueError
+def _text(value):
+    if value is None:
+        return None
+    return str(value).strip() or None
+
+def _real(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        if value is None or not str(value).strip():
+            return None
+        raise ValueError(f"not a number: {value!r}")
+    if math.isnan(number) or math.isinf(number):
+        raise ValueError(f"not a finite number: {value!r}")
+    return number
+
+def _id(value):
+    number = _real(value)
+    if number is None:
+        return None
+    if number <= 0 or number != int(number):
+        raise ValueError(f"ids must be positive integers: {value!r}")
+    return int(number)
+
+def _date(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    value = _text(value)
+    if value is not None and not ISO_DATE.match(value):
+        raise ValueError(f"expected an ISO date (YYYY-MM-DD): {value!r}")
+    return value
+
+CONVERTERS = {"text": _text, "real": _real, "id": _id, "date": _date}
+
+# Function to read a CSV or Parquet file as (header, rows) chunks of at most chunk_size rows
+def read_chunks(path, chunk_size=50000, file_format=None):
+    file_format = file_format or ("parquet" if path.lower().endswith((".parquet", ".pq")) else "csv")
+    if file_format == "parquet":
+        if pq is None:
+            raise RuntimeError("Reading Parquet needs pyarrow, which is not installed.")
+        parquet = pq.ParquetFile(path)
+        header = [name.strip().lower() for name in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            columns = batch.to_pydict()
+            yield header, list(zip(*(columns[name] for name in batch.schema.names)))
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = [name.strip().lower() for name in next(reader, [])]
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            yield header, rows
+
+# Checks rows from a file against one table: every schema column must be in the header (plus the id column
+# optionally); values are converted to the column type and rows that don't fit are reported, not inserted.
+class ChunkValidator:
+    def __init__(self, table, header):
+        spec = TABLES[table]
+        missing = [column for column in spec["columns"] if column not in header]
+        if missing:
+            raise ValueError(f"{table}: file is missing column(s) {', '.join(missing)}")
+        self.columns = list(spec["columns"])
+        self.kinds = [spec["columns"][column] for column in self.columns]
+        self.required = [column in spec["required"] for column in self.columns]
+        self.positions = [header.index(column) for column in self.columns]
+        self.id_column = spec["id"] if spec["id"] in header else None
+        if self.id_column:
+            self.columns.append(self.id_column)
+            self.kinds.append("id")
+            self.required.append(True)
+            self.positions.append(header.index(self.id_column))
+        self.width = len(header)
+
+    # Function to convert one chunk; returns (rows as tuples in self.columns order, [(row number, reason), ...])
+    def validate(self, rows, first_row=1):
+        valid, errors = [], []
+        converters = [(position, CONVERTERS[kind]) for position, kind in zip(self.positions, self.kinds)]
+        required = [i for i, flag in enumerate(self.required) if flag]
+        for number, row in enumerate(rows, first_row):
+            if len(row) != self.width:
+                errors.append((number, f"expected {self.width} fields, got {len(row)}"))
+                continue
+            try:
+                values = tuple([convert(row[position]) for position, convert in converters])
+            except (TypeError, ValueError) as e:
+                errors.append((number, str(e)))
+                continue
+            for i in required:
+                if values[i] is None:
+                    errors.append((number, f"{self.columns[i]} is required"))
+                    break
+            else:
+                valid.append(values)
+        return valid, errors
+
+# Function to open the write connection with load-time settings: WAL (readers keep working), NORMAL sync
+# (durable at checkpoints, safe in WAL), a large page cache and in-memory temp storage.
+def connect(db_path=DB_PATH, cache_size_kib=262144):
+    conn = sqlite3.connect(db_path, timeout=30.0, isolation_level=None)  # Transactions are managed explicitly
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute(f"PRAGMA cache_size=-{int(cache_size_kib)};")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    return conn
+
+# Function to drop a table's explicit indexes so the load doesn't maintain them row by row.
+# Returns [(name, sql)] for rebuild_indexes.
+def drop_indexes(conn, table):
+    indexes = conn.execute(
+        "select name, sql from sqlite_master where type = 'index' and tbl_name = ? and sql is not null;",
+        (table,)).fetchall()
+    for name, _ in indexes:
+        conn.execute(f'drop index "{name}";')
+    return indexes
+
+# Function to estimate the rows in the input files without reading them: Parquet metadata, or for CSV the
+# file size over the average length of the lines in its first megabyte
+def estimate_rows(paths, file_format=None):
+    total = 0
+    for path in paths:
+        if (file_format or ("parquet" if path.lower().endswith((".parquet", ".pq")) else "csv")) == "parquet":
+            if pq is not None:
+                total += pq.ParquetFile(path).metadata.num_rows
+            continue
+        with open(path, "rb") as f:
+            head = f.read(1 << 20)
+        lines = head.count(b"\n")
+        if lines > 1:
+            total += int(os.path.getsize(path) * (lines - 1) / lines / (len(head) / lines))
+    return total
+
+# Function to decide whether to drop the table's indexes for the rest of a load: maintaining an index costs
+# a B-tree insert per row, rebuilding it costs a sort of the whole table, so deferring only pays off when the
+# table is empty or the rows still to come are at least DEFER_INDEX_RATIO of the rows already there
+def should_defer_indexes(conn, table, incoming):
+    existing = conn.execute(f"select count(*) from {table};").fetchone()[0]
+    return existing == 0 or incoming >= DEFER_INDEX_RATIO * existing
+
+# Function to recreate dropped indexes
+def rebuild_indexes(conn, indexes):
+    for name, sql in indexes:
+        if conn.execute("select 1 from sqlite_master where type = 'index' and name = ?;", (name,)).fetchone() is None:
+            conn.execute(sql)
+
+# Function to load files into one table. Rows at or below the watermark (the table's current max of
+# watermark_column; by default the id column when the file has one) are skipped, so re-running a load or
+# loading a cumulative export only appends new rows. defer_indexes=None drops the table's indexes for the load
+# (rebuilding them at the end) only when should_defer_indexes() says it pays off; True always does, False never.
+# A load with deferred indexes runs as a single transaction, the drop and rebuild included, so readers keep
+# the indexes throughout and a failed or killed load leaves the table as it was. Returns a report with counts and rows/sec.
+def load(table, paths, db_path=DB_PATH, chunk_size=50000, commit_rows=500000, file_format=None,
+         watermark_column=None, max_errors=0, defer_indexes=None, refresh_views=True, progress=None):
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; expected one of {', '.join(TABLES)}")
+    conn = connect(db_path)
+    report = {"table": table, "read": 0, "inserted": 0, "skipped": 0, "rejected": 0, "errors": [],
+              "indexes_deferred": False, "index_seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        conn.execute(TABLES[table]["schema"])  # Tables are created on first load
+        index_sql = None  # Indexes are dropped right before the first insert, so a no-op load keeps them
+        expected = estimate_rows(paths, file_format) if defer_indexes is None else 0
+        try:
+            pending = 0
+            conn.execute("begin immediate;")
+            for path in paths:
+                validator = None
+                watermark = None
+                row_number = 1
+                for header, rows in read_chunks(path, chunk_size, file_format):
+                    if validator is None:
+                        validator = ChunkValidator(table, header)
+                        column = watermark_column or validator.id_column
+                        if column is not None:
+                            if column not in validator.columns:
+                                raise ValueError(f"watermark column {column!r} is not loaded from {path}")
+                            watermark = (validator.columns.index(column),
+                                         conn.execute(f"select max({column}) from {table};").fetchone()[0])
+                    valid, errors = validator.validate(rows, row_number + 1)  # +1 for the header line
+                    row_number += len(rows)
+                    report["read"] += len(rows)
+                    report["rejected"] += len(errors)
+                    room = 100 - len(report["errors"])  # Keep the first 100 problems for the report
+                    report["errors"].extend((path, number, reason) for number, reason in errors[:room])
+                    if report["rejected"] > max_errors:
+                        raise ValueError(f"{report['rejected']} invalid rows (limit {max_errors}); "
+                                         f"first: {report['errors'][0]}")
+                    if watermark is not None and watermark[1] is not None:
+                        position, high = watermark
+                        kept = [row for row in valid if row[position] is not None and row[position] > high]
+                        report["skipped"] += len(valid) - len(kept)
+                        valid = kept
+                    if valid and defer_indexes is not False and index_sql is None:
+                        # Decided once, at the first insert: the rows still to come (this chunk onwards) vs the table
+                        incoming = max(expected - report["read"] + len(rows), len(valid))
+                        if defer_indexes or should_defer_indexes(conn, table, incoming):
+                            index_sql = drop_indexes(conn, table)
+                            report["indexes_deferred"] = bool(index_sql)
+                        else:
+                            index_sql = []
+                    conn.executemany(
+                        f"insert into {table} ({', '.join(validator.columns)}) "
+                        f"values ({', '.join('?' for _ in validator.columns)});", valid)
+                    report["inserted"] += len(valid)
+                    pending += len(valid)
+                    if pending >= commit_rows and not index_sql:  # Deferred indexes: one transaction
+                        conn.execute("commit;")
+                        conn.execute("begin immediate;")
+                        pending = 0
+                    if progress is not None:
+                        progress(report, time.perf_counter() - started)
+            if index_sql:
+                index_started = time.perf_counter()
+                rebuild_indexes(conn, index_sql)
+                report["index_seconds"] = time.perf_counter() - index_started
+            conn.execute("commit;")
+        except BaseException:
+            # Rolling back also undoes a drop of the indexes, so a bad file never leaves the table without them
+            if conn.in_transaction:
+                conn.execute("rollback;")
+            raise
+        conn.execute("PRAGMA optimize;")
+    finally:
+        conn.close()
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["inserted"] / report["seconds"] if report["seconds"] else 0.0
+    if refresh_views and report["inserted"]:
+        report["views"] = refresh_materialized(db_path, table)
+    return report
+
+# Function to bring the table's summary tables (materialize.py) up to date after a load, if any exist
+def refresh_materialized(db_path, table):
+    import materialize
+
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        if conn.execute("select 1 from sqlite_master where name = 'mv_state';").fetchone() is None:
+            return {}
+        views = [view for view, spec in materialize.VIEWS.items() if spec["table"] == table]
+        return materialize.refresh(conn, views)  # Verifies the groups it recomputes; the full check runs separately
+    finally:
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load CSV/Parquet exports into combined.db.")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows read and validated at a time")
+    parser.add_argument("--commit-rows", type=int, default=500000, help="rows per transaction (a load with deferred indexes commits once)")
+    parser.add_argument("--watermark-column", help="skip rows whose value is not above the table's current max "
+                                                   "(default: the id column, when the file has one)")
+    parser.add_argument("--max-errors", type=int, default=0, help="invalid rows to skip before giving up")
+    indexes = parser.add_mutually_exclusive_group()
+    indexes.add_argument("--keep-indexes", action="store_true", help="always maintain indexes during the load "
+                                                                     "(default: only for loads small next to the table)")
+    indexes.add_argument("--defer-indexes", action="store_true", help="always drop indexes and rebuild them afterwards")
+    parser.add_argument("--no-refresh", action="store_true", help="don't refresh the summary tables afterwards")
+    args = parser.parse_args()
+
+    def progress(report, seconds):
+        print(f"\r{report['table']}: {report['inserted']:,} rows inserted, {report['skipped']:,} skipped, "
+              f"{report['rejected']:,} rejected ({report['inserted'] / seconds if seconds else 0:,.0f} rows/s)",
+              end="", flush=True)
+
+    defer_indexes = False if args.keep_indexes else (True if args.defer_indexes else None)
+    try:
+        report = load(args.table, args.files, db_path=args.db, chunk_size=args.chunk_size, commit_rows=args.commit_rows,
+                      file_format=args.format, watermark_column=args.watermark_column, max_errors=args.max_errors,
+                      defer_indexes=defer_indexes, refresh_views=not args.no_refresh, progress=progress)
+    except (OSError, RuntimeError, ValueError, sqlite3.Error) as e:
+        # Transactions committed before the failure are kept; rows of the failed one are rolled back
+        print(f"\nLoad failed: {str(e)}")
+        raise SystemExit(1)
+    print()
+    print(f"{report['table']}: {report['read']:,} rows read, {report['inserted']:,} inserted, "
+          f"{report['skipped']:,} below the watermark, {report['rejected']:,} rejected in {report['seconds']:.1f}s "
+          f"({report['rows_per_sec']:,.0f} rows/s; "
+          + (f"index rebuild {report['index_seconds']:.1f}s)" if report["indexes_deferred"] else "indexes kept)"))
+    for path, number, reason in report["errors"][:20]:
+        print(f"  {path}:{number}: {reason}")
+    for view, info in report.get("views", {}).items():
+        print(f"  {view}: {info['groups_updated']} groups refreshed, "
+              f"{'verified' if info['verified'] else 'NOT VERIFIED (run materialize.py --check)'}")
+
+if __name__ == "__main__":
+    main()
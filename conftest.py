@@ -0,0 +1,85 @@
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+# Shared setup for the pytest suite: a generated database and the mock LLM server, wired in through
+# COMBINED_DB / TOGETHER_API_URL before any app module is imported (they read both at import time).
+# Usage: python -m pytest -q
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(REPO_ROOT, "benchmarks"))
+
+import generate_data  # noqa: E402
+import mock_llm_server  # noqa: E402
+
+# A query that never finishes on its own, for time budget tests
+ENDLESS_SQL = "with recursive c(x) as (select 1 union all select x + 1 from c) select count(*) from c"
+
+TEST_ROWS = 2000
+TEST_DIR = tempfile.mkdtemp(prefix="sqlbot-tests-")
+TEST_DB = os.path.join(TEST_DIR, "combined.db")
+
+generate_data.generate(TEST_DB, TEST_ROWS)
+_conn = sqlite3.connect(TEST_DB)
+_conn.execute("PRAGMA journal_mode=WAL;")  # As app startup does, so a writer never waits on a pinned read snapshot
+_conn.close()
+LLM_SERVER, LLM_URL = mock_llm_server.start_server(latency=0.2)
+LLM_SERVER.handle_error = lambda request, address: None  # Timeout tests hang up before the reply
+
+os.environ["COMBINED_DB"] = TEST_DB
+os.environ["TOGETHER_API_URL"] = LLM_URL
+
+def pytest_unconfigure(config):
+    LLM_SERVER.shutdown()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def db_path():
+    return TEST_DB
+
+@pytest.fixture(scope="session")
+def llm_url():
+    return LLM_URL
+
+@pytest.fixture(scope="session")
+def endless_sql():
+    return ENDLESS_SQL
+
+# A read-only pool on the generated database, separate from the app's shared one
+@pytest.fixture
+def pool():
+    from db_pool import ConnectionPool
+
+    pool = ConnectionPool(TEST_DB, max_connections=4)
+    yield pool
+    pool.close_all()
+
+# A fresh copy of the generated database for tests that write to it
+@pytest.fixture
+def scratch_db(tmp_path):
+    path = str(tmp_path / "scratch.db")
+    source = sqlite3.connect(TEST_DB)
+    target = sqlite3.connect(path)
+    source.backup(target)
+    source.close()
+    target.execute("PRAGMA journal_mode=WAL;")
+    target.close()
+    return path
+
+# Function to insert one sales row through a separate connection, the way another process would
+def _add_sale(db_path, customer_name="Test Customer", revenue=10.0, region="North"):
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("insert into sales (customer_name, revenue, region, sale_date) values (?, ?, ?, '2024-01-01')",
+                     (customer_name, revenue, region))
+        conn.commit()
+    finally:
+        conn.close()
+
+@pytest.fixture(scope="session")
+def add_sale():
+    return _add_sale
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("COMBINED_DB", "combined.db")  # Override to point the app at another copy
+
+# Function to switch the database to WAL once so readers never block behind a writer (the setting is stored in the file)
+def init_database(db_path=DB_PATH):
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=rw", uri=True)
+    except sqlite3.Error:
+        return None  # Missing or read-only file: readers still work, just without WAL
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL;").fetchone()[0]
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+
+# Bounded pool of read-only SQLite connections shared by the request threads.
+# A connection is only ever used by one thread at a time; it goes back to the pool when the thread is done,
+# so its page cache and statement cache survive across requests.
+class ConnectionPool:
+    def __init__(self, db_path=DB_PATH, max_connections=8, timeout=10.0,
+                 mmap_size=256 * 1024 * 1024, cache_size_kib=16384, cached_statements=256):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+        self.cached_statements = cached_statements
+        self._idle = []
+        self._created = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+        # Counters for /pool/stats
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.peak_in_use = 0
+
+    # Open one read-only connection and apply the per-connection pragmas once
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro",
+            uri=True,
+            check_same_thread=False,  # Handed between threadpool workers, but never used by two at once
+            cached_statements=self.cached_statements,
+        )
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)};")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kib)};")
+        conn.execute("PRAGMA query_only=1;")
+        return conn
+
+    def acquire(self):
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while not self._idle and self._created >= self.max_connections:
+                waited = True
+                remaining = self.timeout - (time.perf_counter() - start)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._created >= self.max_connections:
+                        raise sqlite3.OperationalError("connection pool exhausted")
+            conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                self._created += 1  # Reserve the slot; the connection is opened outside the lock
+            self._in_use += 1
+            self.acquisitions += 1
+            self.peak_in_use = max(self.peak_in_use, self._in_use)
+            if waited:
+                self.waits += 1
+                self.wait_seconds += time.perf_counter() - start
+        if conn is None:
+            try:
+                conn = self._connect()
+            except sqlite3.Error:
+                with self._cond:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+        return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._in_use -= 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    # Function to open connections ahead of the first requests (e.g. at app startup)
+    def warm(self, count=None):
+        count = self.max_connections if count is None else min(count, self.max_connections)
+        conns = []
+        try:
+            for _ in range(count):
+                conns.append(self.acquire())
+        finally:
+            for conn in conns:
+                self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            for conn in self._idle:
+                conn.close()
+            self._created -= len(self._idle)
+            self._idle.clear()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_connections": self.max_connections,
+                "open": self._created,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "peak_in_use": self.peak_in_use,
+                "utilization": self._in_use / self.max_connections,
+                "acquisitions": self.acquisitions,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 6),
+            }
+
+# Shared pool used by app.py and backend.py
+pool = ConnectionPool(DB_PATH, max_connections=16)
@@ -0,0 +1,207 @@
+import base64
+import csv
+import io
+import json
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used instead
+    orjson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Optional: without pyarrow the Arrow format is refused
+    pa = None
+
+# Response formats: ?format=<name> or the matching Accept media type
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/vnd.sqlbot.columnar+json",
+    "csv": "text/csv; charset=utf-8",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+ACCEPT_TYPES = {
+    "application/json": "json",
+    "application/vnd.sqlbot.columnar+json": "columnar",
+    "text/csv": "csv",
+    "application/vnd.apache.arrow.stream": "arrow",
+    "*/*": "json",
+    "application/*": "json",
+}
+
+# Function to encode values JSON has no type for: SQLite BLOBs come back as bytes and are sent as text
+# (decoded as UTF-8 when they are, base64 otherwise)
+def _json_default(value):
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        value = bytes(value)
+        try:
+            return value.decode()
+        except UnicodeDecodeError:
+            return base64.b64encode(value).decode()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Function to encode an object as compact JSON bytes (orjson when installed)
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default)
+    return json.dumps(obj, separators=(",", ":"), default=_json_default).encode()
+
+# Function to pick the response format: ?format= wins, then the Accept entry with the highest q, then JSON
+# (so existing clients keep working whatever they send). Returns None only for an unknown ?format=.
+def negotiate(format_name=None, accept=None):
+    if format_name:
+        format_name = format_name.lower()
+        return format_name if format_name in MEDIA_TYPES else None
+    if not accept:
+        return "json"
+    choices = []
+    for position, entry in enumerate(accept.split(",")):
+        media_type, _, options = entry.strip().partition(";")
+        quality = 1.0
+        for option in options.split(";"):
+            key, _, value = option.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type.strip().lower() in ACCEPT_TYPES and quality > 0:
+            choices.append((-quality, position, ACCEPT_TYPES[media_type.strip().lower()]))
+    return min(choices)[2] if choices else "json"
+
+# Function to turn {"columns", "data": rows} into column arrays: {"columns", "arrays": [[col0...], [col1...]]}
+def columnar(results):
+    arrays = [list(values) for values in zip(*results["data"])] if results["data"] else [[] for _ in results["columns"]]
+    columnar_results = {key: value for key, value in results.items() if key != "data"}
+    columnar_results["arrays"] = arrays
+    return columnar_results
+
+# Incremental encoders for tabular output. begin() and end() frame the output, encode(rows) turns one batch of
+# rows into bytes, so a response can be written batch by batch as the cursor produces rows.
+# types are the SQLite declared types of the columns where known ("" otherwise); begin(rows) may be given the
+# whole result when it is already in memory.
+class CSVEncoder:
+    media_type = MEDIA_TYPES["csv"]
+    extension = "csv"
+
+    def __init__(self, columns, types=None):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _drain(self):
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def begin(self, rows=None):
+        self._writer.writerow(self.columns)
+        return self._drain()
+
+    def encode(self, rows):
+        self._writer.writerows(rows)
+        return self._drain()
+
+    def end(self):
+        return b""
+
+# Arrow IPC stream format. Column types come from the whole result when begin() gets it, else from the first batch:
+# mixed-type columns become strings, integer columns declared REAL/NUMERIC (which SQLite returns as a mix of ints
+# and floats) become doubles, and all-NULL columns take their declared type or string. Later batches are cast
+# to that schema without loss; a value that doesn't fit raises ValueError.
+class ArrowEncoder:
+    media_type = MEDIA_TYPES["arrow"]
+    extension = "arrows"
+
+    def __init__(self, columns, types=None):
+        if pa is None:
+            raise RuntimeError("pyarrow is not installed")
+        self.columns = columns
+        self.types = types or [""] * len(columns)
+        self._sink = io.BytesIO()
+        self._schema = None
+        self._writer = None
+
+    def _drain(self):
+        data = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return data
+
+    @staticmethod
+    def _affinity(declared):
+        # SQLite's column affinity rules, reduced to the Arrow type a column's values should end up as
+        declared = declared.upper()
+        if "INT" in declared:
+            return pa.int64()
+        if any(name in declared for name in ("CHAR", "CLOB", "TEXT")):
+            return pa.string()
+        if not declared or "BLOB" in declared:
+            return None
+        return pa.float64()  # REAL, FLOAT, DOUBLE, NUMERIC, DECIMAL, ...
+
+    def _infer(self, values, declared):
+        target = self._affinity(declared)
+        try:
+            array = pa.array(values)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+            return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+        if pa.types.is_null(array.type):
+            return array.cast(target or pa.string())
+        if pa.types.is_integer(array.type) and target == pa.float64():
+            return array.cast(pa.float64(), safe=True)
+        return array
+
+    @staticmethod
+    def _convert(values, field):
+        if pa.types.is_string(field.type):
+            return pa.array([None if value is None else str(value) for value in values], type=pa.string())
+        try:
+            array = pa.array(values)
+            return array if array.type == field.type else array.cast(field.type, safe=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError, TypeError, OverflowError) as e:
+            raise ValueError(f"Column {field.name!r} no longer fits its Arrow type {field.type}: {str(e)}")
+
+    def _open(self, arrays):
+        self._schema = pa.schema([pa.field(name, array.type) for name, array in zip(self.columns, arrays)])
+        self._writer = pa.ipc.new_stream(self._sink, self._schema)
+
+    # With rows (the whole result) the schema is fixed here from every row; otherwise it is written with the
+    # first batch, once the types are known
+    def begin(self, rows=None):
+        if rows:
+            self._open([self._infer(list(column), declared) for column, declared in zip(zip(*rows), self.types)])
+        return b""
+
+    def encode(self, rows):
+        if not rows:
+            return b""
+        values = list(zip(*rows))
+        if self._writer is None:
+            arrays = [self._infer(list(column), declared) for column, declared in zip(values, self.types)]
+            self._open(arrays)
+        else:
+            arrays = [self._convert(list(column), field) for column, field in zip(values, self._schema)]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+        return self._drain()
+
+    def end(self):
+        if self._writer is None:
+            # Empty result: schema only
+            self._open([pa.array([], type=self._affinity(declared) or pa.string()) for declared in self.types])
+        self._writer.close()
+        return self._drain()
+
+# Tabular encoders by format name; "arrow" is only offered when pyarrow is installed
+ENCODERS = {"csv": CSVEncoder}
+if pa is not None:
+    ENCODERS["arrow"] = ArrowEncoder
+
+# Function to encode rows already in memory with `encoder`, batch_size rows per chunk
+def iter_encoded(encoder, rows, batch_size=1000):
+    yield encoder.begin(rows)
+    for start in range(0, len(rows), batch_size):
+        yield encoder.encode(rows[start:start + batch_size])
+    yield encoder.end()
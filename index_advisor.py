@@ -0,0 +1,335 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from db_pool import DB_PATH, ConnectionPool, pool as default_pool
+from sql_guard import LITERALS, table_aliases
+
+NUMBERS = re.compile(r"(?<![\w.])\d+(?:\.\d+)?\b")
+JOIN_PAIR = re.compile(r"([a-z_]\w*)\.([a-z_]\w*)\s*=\s*([a-z_]\w*)\.([a-z_]\w*)")
+EQUALITY = re.compile(r"(?:([a-z_]\w*)\.)?([a-z_]\w*)\s*(?:==|=|\bin\b)")
+RANGE = re.compile(r"(?:([a-z_]\w*)\.)?([a-z_]\w*)\s*(?:<=|>=|<|>|\bbetween\b|\blike\b)")
+COLUMN_REF = re.compile(r"(?:([a-z_]\w*)\.)?([a-z_]\w*)")
+WHERE = re.compile(r"\b(?:where|on)\b(.*?)(?=\bwhere\b|\bjoin\b|\bgroup\s+by\b|\border\s+by\b|\bhaving\b|\blimit\b|$)")
+GROUP_BY = re.compile(r"\bgroup\s+by\b(.*?)(?=\bhaving\b|\border\s+by\b|\blimit\b|$)")
+ORDER_BY = re.compile(r"\border\s+by\b(.*?)(?=\blimit\b|$)")
+SELECT_LIST = re.compile(r"^\s*select\s+(?:distinct\s+)?(.*?)\bfrom\b")
+PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$")
+
+# Function to describe how a plan reads its driving (outermost) table: "search", "skip scan" (a SEARCH whose
+# leading index column is ANY(...), i.e. every distinct value is visited), "covering scan", "index scan" or "scan";
+# None when the plan reads no table
+def driving_access(plan):
+    for detail in plan:
+        step = PLAN_STEP.match(detail)
+        if step is None or step.group(2) == "CONSTANT":
+            continue
+        kind, rest = step.group(1), step.group(4)
+        if kind == "SEARCH":
+            return "skip scan" if "(ANY(" in rest else "search"
+        if "COVERING INDEX" in rest:
+            return "covering scan"
+        return "index scan" if "INDEX" in rest else "scan"
+    return None
+
+# Function to reduce a query to its shape (literals replaced by ?), so repeats with other values group together
+def query_shape(sql):
+    shape = re.sub(r"'(?:[^']|'')*'", "?", sql.lower())
+    shape = NUMBERS.sub("?", shape)
+    return " ".join(shape.split())
+
+# Records the executed workload and turns it into index recommendations.
+# Predicate, join, grouping and ordering columns come from the SQL; EXPLAIN QUERY PLAN decides which
+# tables actually need help (full scans and automatic indexes). Indexes are only created by apply(),
+# which needs a writable connection, so run it offline or in a maintenance window.
+class IndexAdvisor:
+    def __init__(self, pool=default_pool, max_shapes=500, log_path=None, max_index_columns=5):
+        self.pool = pool
+        self.max_shapes = max_shapes
+        self.log_path = log_path  # Optional JSONL file the live workload is appended to
+        self.max_index_columns = max_index_columns
+        self._shapes = OrderedDict()  # shape -> {"sql", "params", "count", "total_ms"}
+        self._lock = threading.Lock()
+
+    # Function called after each executed query
+    def record(self, sql, params=(), seconds=0.0):
+        shape = query_shape(sql)
+        with self._lock:
+            entry = self._shapes.get(shape)
+            if entry is None:
+                entry = {"shape": shape, "sql": sql, "params": list(params), "count": 0, "total_ms": 0.0}
+                self._shapes[shape] = entry
+                while len(self._shapes) > self.max_shapes:
+                    self._shapes.popitem(last=False)
+            entry["count"] += 1
+            entry["total_ms"] += seconds * 1000
+            if self.log_path:
+                with open(self.log_path, "a") as log:
+                    log.write(json.dumps({"sql": sql, "params": list(params), "ms": seconds * 1000}) + "\n")
+
+    # Workload ordered by total time spent, most expensive shapes first
+    def workload(self):
+        with self._lock:
+            entries = [dict(entry) for entry in self._shapes.values()]
+        return sorted(entries, key=lambda entry: -entry["total_ms"])
+
+    def _columns(self, conn, table, cache):
+        if table not in cache:
+            cache[table] = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}");')]
+        return cache[table]
+
+    def _existing_indexes(self, conn, table):
+        indexes = []
+        for row in conn.execute(f'PRAGMA index_list("{table}");'):
+            indexes.append([info[2] for info in conn.execute(f'PRAGMA index_info("{row[1]}");')])
+        return indexes
+
+    # Function to find which columns of which tables a query filters, joins, groups and orders on,
+    # and which tables the current plan scans or joins without an index
+    def analyze_query(self, conn, sql, params=(), table_columns=None):
+        table_columns = {} if table_columns is None else table_columns
+        aliases = table_aliases(sql)
+        tables = [t for t in dict.fromkeys(aliases.values()) if self._columns(conn, t, table_columns)]
+        usage = {table: {"eq": [], "join": [], "range": [], "group": [], "order": [], "select": []} for table in tables}
+
+        def resolve(qualifier, column):
+            if qualifier:
+                table = aliases.get(qualifier)
+                return table if table in usage and column in table_columns[table] else None
+            for table in tables:
+                if column in table_columns[table]:
+                    return table
+            return None
+
+        def add(kind, qualifier, column):
+            table = resolve(qualifier, column)
+            if table is not None and column not in usage[table][kind]:
+                usage[table][kind].append(column)
+
+        bare = " ".join(LITERALS.sub(" ? ", sql).lower().split())
+        for clause in WHERE.findall(bare):
+            for left_alias, left, right_alias, right in JOIN_PAIR.findall(clause):
+                add("join", left_alias, left)
+                add("join", right_alias, right)
+            clause = JOIN_PAIR.sub(" ", clause)
+            for qualifier, column in EQUALITY.findall(clause):
+                add("eq", qualifier, column)
+            for qualifier, column in RANGE.findall(clause):
+                add("range", qualifier, column)
+        for kind, pattern in (("group", GROUP_BY), ("order", ORDER_BY), ("select", SELECT_LIST)):
+            for clause in pattern.findall(bare):
+                for qualifier, column in COLUMN_REF.findall(clause):
+                    add(kind, qualifier, column)
+
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        needs_index = set()
+        for detail in plan:
+            step = PLAN_STEP.match(detail)
+            if step is None:
+                continue
+            kind, name, alias, rest = step.groups()
+            table = aliases.get((alias or name).lower(), name)
+            if kind == "SCAN" and "INDEX" not in rest or "AUTOMATIC" in rest:
+                needs_index.add(table)
+        return {"usage": usage, "plan": plan, "needs_index": sorted(t for t in needs_index if t in usage)}
+
+    # Function to turn the workload into CREATE INDEX statements, most useful first
+    def recommend(self, conn, workload=None):
+        workload = self.workload() if workload is None else workload
+        table_columns = {}
+        candidates = OrderedDict()  # (table, columns) -> recommendation
+        for entry in workload:
+            try:
+                analysis = self.analyze_query(conn, entry["sql"], entry.get("params", ()), table_columns)
+            except sqlite3.Error:
+                continue
+            for table in analysis["needs_index"]:
+                use = analysis["usage"][table]
+                # Equality filters first, then join keys, then one range column; otherwise grouping/ordering
+                key = list(dict.fromkeys(use["eq"] + use["join"]))
+                if use["range"]:
+                    key.append(use["range"][0])
+                if not key:
+                    key = use["group"] or use["order"]
+                key = list(dict.fromkeys(key))
+                if not key:
+                    continue
+                # Make it covering when the query only needs a few more columns from this table
+                extra = [c for c in use["select"] + use["group"] + use["order"] if c not in key]
+                extra = list(dict.fromkeys(extra))
+                columns = key + extra if len(key) + len(extra) <= self.max_index_columns else key
+                reason = ", ".join(f"{kind} on {', '.join(cols)}" for kind, cols in use.items() if cols and kind != "select")
+                rec = candidates.setdefault((table, tuple(columns)), {
+                    "table": table, "columns": columns, "reason": reason, "queries": [], "weight": 0.0,
+                })
+                rec["queries"].append(entry.get("shape") or query_shape(entry["sql"]))
+                rec["weight"] += entry.get("total_ms", 0.0) or entry.get("count", 1)
+
+        # Candidates with the same columns in another order overlap: one index is kept, in the column order that
+        # serves the most workload (weight, then query shapes), and takes over the other's queries
+        merged = OrderedDict()
+        for (table, columns), rec in candidates.items():
+            merged.setdefault((table, frozenset(columns)), []).append(rec)
+        candidates = OrderedDict()
+        for group in merged.values():
+            best = max(group, key=lambda rec: (rec["weight"], len(rec["queries"])))
+            for rec in group:
+                if rec is not best:
+                    best["queries"] = list(dict.fromkeys(best["queries"] + rec["queries"]))
+                    best["weight"] += rec["weight"]
+                    best["reason"] = "; ".join(dict.fromkeys([best["reason"], rec["reason"]]))
+            candidates[(best["table"], tuple(best["columns"]))] = best
+
+        # Drop candidates that are a prefix of another candidate or of an existing index on the same table
+        recommendations = []
+        for (table, columns), rec in candidates.items():
+            longer = [other for (t, other) in candidates if t == table and other != columns
+                      and other[:len(columns)] == columns]
+            if longer:
+                target = candidates[(table, longer[0])]
+                target["queries"] = list(dict.fromkeys(target["queries"] + rec["queries"]))
+                target["weight"] += rec["weight"]
+                continue
+            existing = self._existing_indexes(conn, table)
+            if any(index[:len(columns)] == list(columns) for index in existing):
+                continue
+            recommendations.append(rec)
+        for rec in recommendations:
+            rec["name"] = f"idx_{rec['table']}_{'_'.join(rec['columns'])}"
+            rec["sql"] = (f'create index if not exists "{rec["name"]}" on "{rec["table"]}" '
+                          f'({", ".join(rec["columns"])})')
+        return sorted(recommendations, key=lambda rec: -rec["weight"])
+
+    # Best-of-N wall time for a query, with its plan
+    def _measure(self, conn, sql, params, repeat=3):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        return {"plan": plan, "ms": best * 1000}
+
+    # Function to create the recommended indexes, run ANALYZE, and report before/after plan and timing per query shape.
+    # A shape only counts as improved when its driving table is searched afterwards (not scanned, even through a
+    # covering index); indexes that no plan uses after ANALYZE are dropped again and listed as unused.
+    def apply(self, db_path, recommendations, workload=None, repeat=3):
+        workload = self.workload() if workload is None else workload
+        conn = sqlite3.connect(db_path)
+        try:
+            before = {}
+            for entry in workload:
+                try:
+                    before[entry["sql"]] = self._measure(conn, entry["sql"], entry.get("params", ()), repeat)
+                except sqlite3.Error:
+                    continue
+            created = []
+            for rec in recommendations:
+                started = time.perf_counter()
+                conn.execute(rec["sql"])
+                created.append({"name": rec["name"], "sql": rec["sql"], "build_ms": (time.perf_counter() - started) * 1000})
+            conn.execute("ANALYZE;")
+            conn.commit()
+            report = []
+            for entry in workload:
+                if entry["sql"] not in before:
+                    continue
+                after = self._measure(conn, entry["sql"], entry.get("params", ()), repeat)
+                old = before[entry["sql"]]
+                old["driving"], after["driving"] = driving_access(old["plan"]), driving_access(after["plan"])
+                report.append({
+                    "shape": entry.get("shape") or query_shape(entry["sql"]),
+                    "before": old,
+                    "after": after,
+                    "speedup": old["ms"] / after["ms"] if after["ms"] else None,
+                    "improved": after["driving"] == "search" and old["driving"] != "search",
+                })
+            used = " ".join(" ".join(item["after"]["plan"]) for item in report) + " "
+            unused = [index for index in created if f" {index['name']} " not in used]
+            for index in unused:
+                conn.execute(f'drop index if exists "{index["name"]}"')
+            conn.commit()
+            created = [index for index in created if index not in unused]
+            return {"created": created, "unused": unused, "queries": report}
+        finally:
+            conn.close()
+
+# Shared advisor fed by app.execute_query; INDEX_ADVISOR_LOG keeps the workload for offline runs
+advisor = IndexAdvisor(log_path=os.environ.get("INDEX_ADVISOR_LOG"))
+
+# Function to read a JSONL workload log ({"sql", "params"} per line) into workload entries
+def load_workload(path):
+    entries = OrderedDict()
+    with open(path) as log:
+        for line in log:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            shape = query_shape(item["sql"])
+            entry = entries.setdefault(shape, {"shape": shape, "sql": item["sql"], "params": item.get("params", []),
+                                               "count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += item.get("ms", 0.0)
+    return list(entries.values())
+
+# Function to build a workload from the built-in question templates when no log is available
+def template_workload(db_pool):
+    from intent_matcher import IntentMatcher
+
+    matcher = IntentMatcher(db_pool)
+    with db_pool.connection() as conn:
+        product = conn.execute("select product from orders where product is not null limit 1;").fetchone()
+    questions = ["total customers", "total orders", "top 5 customers by revenue", "who sold more than 100",
+                 "product and revenue"]
+    if product:
+        questions.append(f"who bought {product[0]}")
+    workload = []
+    for question in questions:
+        matched = matcher.match(question)
+        if matched:
+            workload.append({"shape": query_shape(matched["sql"]), "sql": matched["sql"],
+                             "params": matched["params"], "count": 1, "total_ms": 0.0})
+    return workload
+
+def main():
+    parser = argparse.ArgumentParser(description="Recommend (and optionally create) indexes for the query workload.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workload", help="JSONL workload log (set INDEX_ADVISOR_LOG when running app.py)")
+    parser.add_argument("--apply", action="store_true", help="create the indexes and run ANALYZE")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    db_pool = ConnectionPool(args.db, max_connections=1)
+    workload = load_workload(args.workload) if args.workload else template_workload(db_pool)
+    with db_pool.connection() as conn:
+        recommendations = IndexAdvisor(db_pool).recommend(conn, workload)
+    db_pool.close_all()
+    report = {"recommendations": recommendations}
+    for rec in recommendations:
+        print(f"{rec['sql']};  -- {rec['reason']} ({len(rec['queries'])} query shapes)")
+    if not recommendations:
+        print("No new indexes recommended.")
+    if args.apply and recommendations:
+        report.update(IndexAdvisor(db_pool).apply(args.db, recommendations, workload))
+        for item in report["queries"]:
+            print(f"{item['before']['ms']:9.2f} ms -> {item['after']['ms']:9.2f} ms  {item['shape']}")
+            print(f"    before: {' | '.join(item['before']['plan'])}")
+            print(f"    after:  {' | '.join(item['after']['plan'])}")
+            outcome = "now searched" if item["improved"] else f"still {item['after']['driving']}"
+            print(f"    driving table: {item['before']['driving']} -> {outcome}")
+        for index in report["unused"]:
+            print(f"Dropped {index['name']}: no query plan uses it after ANALYZE")
+        improved = sum(item["improved"] for item in report["queries"])
+        print(f"{improved} of {len(report['queries'])} query shapes now search their driving table.")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import re
+import sqlite3
+import threading
+
+from db_pool import pool as default_pool
+from query_cache import db_version
+
+# Leading filler that doesn't change what is being asked ("show me the ...", "what is the ...")
+PREFIX = r"(?:(?:what is|what are|whats|show me|show|list|give me|get|find|tell me)\s+)?(?:the\s+)?"
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+
+# Function to normalize a question for matching: lowercase, punctuation removed except decimal points
+def normalize(text):
+    text = re.sub(r"[^\w\s.]|(?<!\d)\.|\.(?!\d)", " ", text.lower())
+    return " ".join(text.split())
+
+def _number(text, default):
+    if not text:
+        return default
+    if text.isdigit():
+        return int(text)
+    return NUMBER_WORDS.get(text)
+
+# Deterministic templates for the questions the prompt already has canned answers for.
+# Each intent is (name, pattern, builder); the pattern must match the whole normalized question and the
+# builder returns (sql, params) or None when a slot doesn't check out (then the LLM handles the question).
+class IntentMatcher:
+    def __init__(self, pool=default_pool):
+        self.pool = pool
+        self._lock = threading.Lock()
+        self._products = {}  # lowercase product -> product as stored in orders
+        self._products_version = None
+        self.hits = 0
+        self.misses = 0
+        self.intent_hits = {}
+        self.intents = [
+            ("total_customers", PREFIX + r"(?:(?:total|number of) customers|how many customers(?: are there)?)",
+             lambda m: ("select count(distinct customer_name) as total_customers from sales", [])),
+            ("total_orders", PREFIX + r"total orders",
+             lambda m: ("select count(distinct customer_name) as total_orders from orders", [])),
+            ("total_sales", PREFIX + r"total (?:sales|revenue)(?: table)?",
+             lambda m: ("select sum(revenue) as total_sales from sales", [])),
+            ("sold_more_than", r"who sold (?:more than|over) (\d+(?:\.\d+)?)",
+             lambda m: ("select customer_name from sales where revenue > ?", [float(m.group(1))])),
+            ("who_sold_more", r"who sold (?:more|the most)",
+             lambda m: ("select customer_name, sum(revenue) as total_revenue from sales group by customer_name "
+                        "order by total_revenue desc limit 5", [])),
+            ("top_customers", PREFIX + r"top(?: (\d+|[a-z]+))? customers by (?:total )?revenue", self._top_customers),
+            ("who_bought", r"(?:who|which customers?) (?:bought|brought|has|have|ordered) (?:a |an |the )?(.+)",
+             self._who_bought),
+            ("product_revenue", PREFIX + r"products? and revenue",
+             lambda m: ("select distinct s.customer_name, s.revenue, o.product from sales s "
+                        "join orders o on s.customer_name = o.customer_name", [])),
+        ]
+        self.intents = [(name, re.compile(pattern), builder) for name, pattern, builder in self.intents]
+
+    def _top_customers(self, match):
+        limit = _number(match.group(1), 3)
+        if limit is None:
+            return None
+        return ("select customer_name, sum(revenue) as total_revenue from sales group by customer_name "
+                "order by total_revenue desc limit ?", [limit])
+
+    def _who_bought(self, match):
+        product = self.find_product(match.group(1))
+        if product is None:
+            return None
+        return ("select distinct s.customer_name, s.revenue from sales s join orders o "
+                "on s.customer_name = o.customer_name where o.product = ?", [product])
+
+    # Function to look a product name up in the distinct orders.product values (reloaded when the database changes)
+    def find_product(self, text):
+        version = db_version(self.pool.db_path)
+        if version != self._products_version:
+            with self._lock:
+                try:
+                    with self.pool.connection() as conn:
+                        rows = conn.execute("select distinct product from orders where product is not null;").fetchall()
+                except sqlite3.Error:
+                    return None
+                self._products = {normalize(str(row[0])): row[0] for row in rows}
+                self._products_version = version
+        text = normalize(text)
+        for candidate in (text, text[:-1] if text.endswith("s") else text, text + "s"):
+            if candidate in self._products:
+                return self._products[candidate]
+        return None
+
+    # Function to match a question to a template; returns {"intent", "sql", "params"} or None
+    def match(self, question):
+        text = normalize(question)
+        for name, pattern, builder in self.intents:
+            found = pattern.fullmatch(text)
+            if found is None:
+                continue
+            built = builder(found)
+            if built is None:
+                continue
+            self.hits += 1
+            self.intent_hits[name] = self.intent_hits.get(name, 0) + 1
+            return {"intent": name, "sql": built[0], "params": built[1]}
+        self.misses += 1
+        return None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "intents": dict(self.intent_hits),
+        }
+
+# Shared matcher used by app.py
+matcher = IntentMatcher()
@@ -1,39 +1,74 @@
 import gradio as gr
+import json
+import pandas as pd
 import requests
+from urllib.parse import urlencode
 
 # FastAPI endpoint URL
 API_URL = "http://127.0.0.1:8000/query"
+STREAM_URL = "http://127.0.0.1:8000/query/stream"
+DISPLAY_ROWS = 1000  # Rows shown in the table; the download links have the full result
+
+# Function to build the markdown with direct download links for the full result of a question
+def download_links(user_query):
+    links = [f"[{label}]({STREAM_URL}?{urlencode({'query': user_query, 'format': name})})"
+             for label, name in (("Download CSV", "csv"), ("Download Arrow", "arrow"))]
+    return " · ".join(links)
 
 def query_sql(user_query):
+    status = []
+    columns, rows = [], []
+    table = pd.DataFrame()
     try:
-        # Send GET request to FastAPI endpoint with the query as a parameter
-        response = requests.get(f"{API_URL}?query={user_query}")
-        response.raise_for_status()  # Raise an exception for bad status codes
-        result = response.json()
-
-        # Format the result for display
-        output = f"Generated SQL Query: {result['sql']}\n\n"
-        if "error" in result:
-            output += f"Error: {result['error']}"
-        else:
-            output += "Results:\n"
-            output += f"Columns: {', '.join(result['results']['columns'])}\n"
-            for row in result['results']['data']:
-                output += str(row) + "\n"
-        return output
+        # Stream the result from FastAPI and fill the table as rows arrive (one JSON frame per line).
+        # Rows are appended to one list and the table is only rebuilt while it is still growing.
+        with requests.get(STREAM_URL, params={"query": user_query}, stream=True) as response:
+            response.raise_for_status()  # Raise an exception for bad status codes
+            for frame in response.iter_lines():
+                if not frame:
+                    continue
+                frame = json.loads(frame)
+                if "error" in frame:
+                    if "sql" in frame and not status:
+                        status.append(f"Generated SQL Query: {frame['sql']}")
+                    status.append(f"Error: {frame['error']}")
+                elif "columns" in frame:
+                    columns = frame["columns"]
+                    status.append(f"Generated SQL Query: {frame['sql']}")
+                    if frame.get("params"):
+                        status.append(f"Parameters: {frame['params']}")
+                    for warning in frame.get("warnings", []):
+                        status.append(f"Warning: {warning}")
+                    table = pd.DataFrame(columns=columns)
+                elif "rows" in frame:
+                    if len(rows) >= DISPLAY_ROWS:
+                        continue
+                    rows.extend(frame["rows"][:DISPLAY_ROWS - len(rows)])
+                    table = pd.DataFrame(rows, columns=columns)
+                elif "done" in frame:
+                    note = f" (showing first {len(rows)})" if frame["row_count"] > len(rows) else ""
+                    if frame.get("truncated"):
+                        note += " - cut off at the row limit"
+                    status.append(f"Rows: {frame['row_count']}{note}")
+                links = download_links(user_query) if columns else ""
+                yield "\n".join(status), table, links
     except requests.exceptions.RequestException as e:
-        return f"Error connecting to API: {str(e)}"
+        yield f"Error connecting to API: {str(e)}", table, ""
     except Exception as e:
-        return f"Error processing query: {str(e)}"
+        yield f"Error processing query: {str(e)}", table, ""
 
 # Create Gradio interface
 interface = gr.Interface(
     fn=query_sql,
     inputs=gr.Textbox(lines=2, placeholder="Enter your query (e.g., 'top 3 customers by revenue')"),
-    outputs=gr.Textbox(lines=10, label="Results"),
+    outputs=[
+        gr.Textbox(lines=3, label="Query"),
+        gr.Dataframe(label="Results", wrap=True),
+        gr.Markdown(),
+    ],
     title="SQL Query Bot",
     description="Enter a natural language query to generate and execute a SQL query on the combined database (sales and orders tables)."
 )
 
 if __name__ == "__main__":
-    interface.launch()
\ No newline at end of file
+    interface.queue().launch()  # Queue is needed for the streamed (generator) output
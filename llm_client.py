@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+
+from metrics import metrics
+
+# Long-lived async client for the Together AI /inference endpoint.
+# - one pooled httpx.AsyncClient, so connections (and TLS sessions) are kept alive between requests
+# - a semaphore caps the number of in-flight LLM calls; extra callers wait instead of piling onto the API
+# - every call has a timeout that covers both the wait for a slot and the HTTP round trip
+# - identical in-flight requests (same key) are coalesced into a single upstream call
+class LLMClient:
+    def __init__(self, url, headers, max_concurrency=8, timeout=30.0,
+                 max_connections=20, max_keepalive_connections=10):
+        self.url = url
+        self.headers = headers
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+        self._client = None
+        self._semaphore = None
+        self._inflight = {}  # key -> asyncio.Task shared by every caller asking the same thing
+        # Counters
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    # Create the HTTP client and semaphore inside the running event loop
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=self.limits,
+                timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, 5.0)),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._semaphore = None
+
+    # Function to send one payload; returns {"result": <json>} or {"error": "..."} like the rest of the app
+    async def complete(self, key, payload, timeout=None):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._call(payload, timeout or self.timeout))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield() so one caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _call(self, payload, timeout):
+        await self.start()
+        self.calls += 1
+        try:
+            return await asyncio.wait_for(self._post(payload), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return {"error": f"API Error: no response within {timeout:g}s"}
+        except httpx.HTTPError as e:
+            self.errors += 1
+            return {"error": f"API Error: {str(e)}"}
+
+    async def _post(self, payload):
+        async with self._semaphore:
+            response = await self._client.post(self.url, json=payload)
+        if response.status_code != 200:
+            self.errors += 1
+            return {"error": f"API Error: {response.status_code}\n{response.text}"}
+        result = response.json()
+        metrics.record_usage(result)  # Counted once per upstream call, not per coalesced caller
+        return {"result": result}
+
+    def stats(self):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
@@ -0,0 +1,340 @@
+import argparse
+import re
+import sqlite3
+import threading
+import time
+
+from db_pool import DB_PATH
+from query_cache import db_version
+
+# Summary tables kept inside combined.db. Each one groups a base table by one key column.
+# Fewer groups first: count(*) rewrites use the first usable view for a table.
+VIEWS = {
+    "mv_sales_by_region": {"table": "sales", "id": "id", "key": "region",
+                           "aggregates": {"sum(revenue)": "total_revenue", "count(*)": "row_count"}},
+    "mv_orders_by_product": {"table": "orders", "id": "order_id", "key": "product",
+                             "aggregates": {"sum(order_amount)": "total_amount", "count(*)": "row_count"}},
+    "mv_sales_by_day": {"table": "sales", "id": "id", "key": "sale_date",
+                        "aggregates": {"sum(revenue)": "total_revenue", "count(*)": "row_count"}},
+    "mv_sales_by_customer": {"table": "sales", "id": "id", "key": "customer_name",
+                             "aggregates": {"sum(revenue)": "total_revenue", "count(*)": "row_count"}},
+    "mv_orders_by_customer": {"table": "orders", "id": "order_id", "key": "customer_name",
+                              "aggregates": {"sum(order_amount)": "total_amount", "count(*)": "row_count"}},
+}
+
+STATE_SCHEMA = """
+create table if not exists mv_state (
+    name text primary key,
+    watermark integer,
+    verified_watermark integer,
+    has_null_keys integer,
+    refreshed_at text
+)"""
+
+# Groups touched by updates, deletes and inserts below the watermark, filled by the mv_* triggers on the base tables
+DIRTY_SCHEMA = "create table if not exists mv_dirty (view text not null, key)"
+
+# Function to create the triggers that queue the groups a write to `table` touches outside the watermark's reach:
+# updates and deletes anywhere, and inserts at or below the highest watermark of the table's views. Appends above it
+# are picked up by the watermark, so a bulk load pays one integer comparison per row. Call again after raising a
+# watermark; the insert trigger is only recreated when its threshold changes.
+def _create_triggers(conn, table):
+    views = [view for view, spec in VIEWS.items() if spec["table"] == table]
+    id_column = VIEWS[views[0]]["id"]
+
+    def entries(row):
+        return ", ".join(f"('{view}', {row}.{VIEWS[view]['key']})" for view in views)
+
+    conn.execute(f"create trigger if not exists mv_{table}_update after update on {table} begin "
+                 f"insert into mv_dirty (view, key) values {entries('old')}, {entries('new')}; end")
+    conn.execute(f"create trigger if not exists mv_{table}_delete after delete on {table} begin "
+                 f"insert into mv_dirty (view, key) values {entries('old')}; end")
+    placeholders = ", ".join("?" for _ in views)
+    threshold = conn.execute(f"select max(watermark) from mv_state where name in ({placeholders})", views).fetchone()[0]
+    condition = f"when new.{id_column} <= {int(threshold or 0)} "
+    existing = conn.execute("select sql from sqlite_master where type = 'trigger' and name = ?",
+                            (f"mv_{table}_insert",)).fetchone()
+    if existing is None or condition not in existing[0]:
+        conn.execute(f"drop trigger if exists mv_{table}_insert")
+        conn.execute(f"create trigger mv_{table}_insert after insert on {table} {condition}"
+                     f"begin insert into mv_dirty (view, key) values {entries('new')}; end")
+
+TRIGGER_OPERATIONS = ("update", "delete", "insert")
+
+LIMIT_TAIL = r"((?: limit (?:\d+|\?)(?:(?: offset|,) (?:\d+|\?))?)?)"
+GROUP_QUERY = re.compile(r"select (\w+), (.+?) from (\w+) group by (\w+)((?: order by .+?)?)" + LIMIT_TAIL)
+COUNT_DISTINCT = re.compile(r"select count\(distinct (\w+)\)((?: as \w+)?) from (\w+)" + LIMIT_TAIL)
+COUNT_ALL = re.compile(r"select count\(\*\)((?: as \w+)?) from (\w+)" + LIMIT_TAIL)
+SELECT_ITEM = re.compile(r"(.+?)(?: as (\w+))?")
+ORDER_ITEM = re.compile(r"(.+?)((?: asc| desc)?)")
+
+# Function to add the group key as the last ORDER BY term of a `select key, ... group by key order by ...` query
+# that doesn't already order by the key; returns None for any other SQL
+def _with_tiebreak(text):
+    match = GROUP_QUERY.fullmatch(text)
+    if match is None:
+        return None
+    key, items, table, group_key, order, limit = match.groups()
+    if key != group_key or not order:
+        return None
+    if any(ORDER_ITEM.fullmatch(term).group(1) == key for term in order[len(" order by "):].split(", ")):
+        return None
+    return f"select {key}, {items} from {table} group by {key}{order}, {key}{limit}"
+
+def _aggregate_sql(view):
+    spec = VIEWS[view]
+    return ", ".join(f"{expr} as {column}" for expr, column in spec["aggregates"].items())
+
+# Function to compare a summary table with the base-table aggregate, over every group or only the groups in
+# temp.mv_dirty_keys; returns up to max_mismatches differing groups and the number of groups compared
+def _compare(conn, view, dirty_only=False, max_mismatches=5):
+    spec = VIEWS[view]
+    table, key = spec["table"], spec["key"]
+    columns = ", ".join(spec["aggregates"].values())
+    dirty = f"{key} in (select key from temp.mv_dirty_keys)"
+    expected = conn.execute(f"select {key}, {', '.join(spec['aggregates'])} from {table} where {key} is not null"
+                            f"{' and ' + dirty if dirty_only else ''} group by {key} order by {key}").fetchall()
+    actual = conn.execute(f"select {key}, {columns} from {view}{' where ' + dirty if dirty_only else ''} "
+                          f"order by {key}").fetchall()
+    mismatches = []
+    expected_by_key = dict((row[0], row) for row in expected)
+    actual_by_key = dict((row[0], row) for row in actual)
+    for group in sorted(set(expected_by_key) | set(actual_by_key), key=str):
+        if expected_by_key.get(group) != actual_by_key.get(group):
+            mismatches.append({"key": group, "base": expected_by_key.get(group), "view": actual_by_key.get(group)})
+            if len(mismatches) >= max_mismatches:
+                break
+    return mismatches, len(expected)
+
+# Function to create the summary tables and bring them up to date.
+# Rows past each view's watermark (max id/order_id already summarized) mark their groups dirty, as do the groups
+# queued in mv_dirty by updates and deletes; every dirty group is recomputed from the base rows, so a summary row
+# always equals the base aggregate for that group. A refresh verifies what it wrote: a rebuild covers every group,
+# an incremental refresh compares the recomputed groups with the base table and keeps the view verified only if it
+# was verified before (the other groups are unchanged). check() compares every group and is run separately.
+def refresh(conn, views=None, full=False):
+    conn.execute(STATE_SCHEMA)
+    conn.execute(DIRTY_SCHEMA)
+    report = {}
+    for view in views or VIEWS:
+        spec = VIEWS[view]
+        table, key, id_column = spec["table"], spec["key"], spec["id"]
+        started = time.perf_counter()
+        if conn.execute("select 1 from sqlite_master where type = 'table' and name = ?", (table,)).fetchone() is None:
+            report[view] = {"groups_updated": 0, "watermark": None, "verified": False, "ms": 0.0}  # No base table yet
+            continue
+        columns = ", ".join(spec["aggregates"].values())
+        conn.execute(f"create table if not exists {view} ({key} primary key not null, {columns}) without rowid")
+        _create_triggers(conn, table)
+        state = conn.execute("select watermark, has_null_keys, verified_watermark from mv_state where name = ?",
+                             (view,)).fetchone()
+        watermark, has_null_keys = (0, 0) if full or state is None else (state[0] or 0, state[1] or 0)
+        new_max = conn.execute(f"select max({id_column}) from {table}").fetchone()[0] or 0
+        # Only the queue entries seen now are cleared below; writes arriving meanwhile stay queued for next time
+        queued = conn.execute("select max(rowid) from mv_dirty where view = ?", (view,)).fetchone()[0]
+        if new_max == watermark and state is not None and not full and queued is None:
+            report[view] = {"groups_updated": 0, "watermark": watermark, "verified": state[2] == watermark, "ms": 0.0}
+            continue
+        if full or state is None or new_max < watermark:
+            # Full rebuild (also on the first refresh and when rows were deleted from the end of the table)
+            conn.execute(f"delete from {view}")
+            conn.execute(f"insert into {view} select {key}, {_aggregate_sql(view)} from {table} "
+                         f"where {key} is not null group by {key}")
+            updated = conn.execute(f"select count(*) from {view}").fetchone()[0]
+            has_null_keys = conn.execute(f"select exists(select 1 from {table} where {key} is null)").fetchone()[0]
+            verified = True
+        else:
+            conn.execute("create temp table if not exists mv_dirty_keys (key primary key) without rowid")
+            conn.execute("delete from temp.mv_dirty_keys")
+            conn.execute(f"insert into temp.mv_dirty_keys select distinct {key} from {table} "
+                         f"where {id_column} > ? and {key} is not null", (watermark,))
+            conn.execute("insert or ignore into temp.mv_dirty_keys select key from mv_dirty "
+                         "where view = ? and rowid <= ? and key is not null", (view, queued or 0))
+            conn.execute(f"delete from {view} where {key} in (select key from temp.mv_dirty_keys)")
+            conn.execute(f"insert into {view} select {key}, {_aggregate_sql(view)} from {table} "
+                         f"where {key} in (select key from temp.mv_dirty_keys) group by {key}")
+            updated = conn.execute("select count(*) from temp.mv_dirty_keys").fetchone()[0]
+            if queued is not None:
+                # An update may have cleared or set a NULL key anywhere in the table
+                has_null_keys = conn.execute(f"select exists(select 1 from {table} where {key} is null)").fetchone()[0]
+            elif not has_null_keys:
+                has_null_keys = conn.execute(f"select exists(select 1 from {table} where {id_column} > ? "
+                                             f"and {key} is null)", (watermark,)).fetchone()[0]
+            verified = state[2] is not None and state[2] == state[0] and not _compare(conn, view, dirty_only=True)[0]
+        conn.execute("delete from mv_dirty where view = ? and rowid <= ?", (view, queued or 0))
+        conn.execute(
+            "insert or replace into mv_state (name, watermark, verified_watermark, has_null_keys, refreshed_at) "
+            "values (?, ?, ?, ?, datetime('now'))", (view, new_max, new_max if verified else None, has_null_keys))
+        _create_triggers(conn, table)  # Raise the insert trigger's threshold along with the watermark
+        conn.commit()
+        report[view] = {"groups_updated": updated, "watermark": new_max, "verified": verified,
+                        "ms": (time.perf_counter() - started) * 1000}
+    return report
+
+# Function to prove each summary table matches the base-table aggregate exactly (every group, every value).
+# That is a full GROUP BY of the base table, so it runs periodically or from the command line, not after every
+# refresh. A view that fails is not used for rewriting until it passes again or is rebuilt with full=True.
+def check(conn, views=None, max_mismatches=5):
+    report = {}
+    for view in views or VIEWS:
+        state = conn.execute("select watermark from mv_state where name = ?", (view,)).fetchone()
+        if state is None:
+            report[view] = {"ok": False, "error": "not materialized"}
+            continue
+        mismatches, groups = _compare(conn, view, max_mismatches=max_mismatches)
+        ok = not mismatches
+        conn.execute("update mv_state set verified_watermark = ? where name = ?", (state[0] if ok else None, view))
+        conn.commit()
+        report[view] = {"ok": ok, "groups": groups, "mismatches": mismatches}
+    return report
+
+# Rewrites generated rollup SQL to read from summary tables that are fresh and verified.
+class Materializer:
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+        self._usable = {}  # view -> {"has_null_keys": bool}
+        self._version = None
+        self._lock = threading.Lock()
+        self.rewrites = 0
+
+    # Views whose watermark equals the base table's max id, that passed check() there, whose triggers exist and
+    # that have no queued updates/deletes; cached per db version (any write changes it). A snapshot connection
+    # (a caller's read transaction) may see older data than the file's current version, so it is read uncached.
+    def _usable_views(self, conn, snapshot=False):
+        if snapshot:
+            return self._read_usable(conn)
+        version = db_version(self.db_path)
+        with self._lock:
+            if version == self._version:
+                return self._usable
+            self._usable, self._version = self._read_usable(conn), version
+            return self._usable
+
+    def _read_usable(self, conn):
+        usable = {}
+        try:
+            states = conn.execute("select name, watermark, verified_watermark, has_null_keys from mv_state").fetchall()
+            pending = set(row[0] for row in conn.execute("select distinct view from mv_dirty"))
+        except sqlite3.Error:
+            states = []  # Nothing materialized yet
+        triggers = set(row[0] for row in conn.execute("select name from sqlite_master where type = 'trigger'"))
+        for name, watermark, verified, has_null_keys in states:
+            spec = VIEWS.get(name)
+            if spec is None or verified is None or verified != watermark or name in pending:
+                continue
+            if any(f"mv_{spec['table']}_{operation}" not in triggers for operation in TRIGGER_OPERATIONS):
+                continue  # Materialized before change tracking existed: run a refresh to add the triggers
+            current = conn.execute(f"select max({spec['id']}) from {spec['table']}").fetchone()[0] or 0
+            if current == watermark:
+                usable[name] = {"has_null_keys": bool(has_null_keys)}
+        return usable
+
+    # Function to rewrite sql onto a summary table; returns (sql, view) or (sql, None) when nothing applies.
+    # Rollups ordered by an aggregate get the group key as a final tiebreak whichever table they read, since SQLite
+    # leaves the order of ties (and so which rows a LIMIT keeps) up to the plan.
+    # Pass snapshot=True when conn is a read transaction the caller holds open.
+    def rewrite(self, conn, sql, snapshot=False):
+        text = " ".join(sql.split())
+        sql = _with_tiebreak(text) or sql
+        usable = self._usable_views(conn, snapshot)
+        if not usable:
+            return sql, None
+        for rewriter in (self._rewrite_group, self._rewrite_count_distinct, self._rewrite_count_all):
+            rewritten = rewriter(text, usable)
+            if rewritten is not None:
+                self.rewrites += 1
+                return rewritten
+        return sql, None
+
+    def _rewrite_group(self, text, usable):
+        match = GROUP_QUERY.fullmatch(text)
+        if match is None:
+            return None
+        key, items, table, group_key, order, limit = match.groups()
+        if key != group_key:
+            return None
+        for view, info in usable.items():
+            spec = VIEWS[view]
+            if spec["table"] != table or spec["key"] != key or info["has_null_keys"]:
+                continue
+            columns = [key]
+            names = {key: key}
+            for item in items.split(", "):
+                found = SELECT_ITEM.fullmatch(item)
+                expr, alias = found.group(1), found.group(2)
+                if expr not in spec["aggregates"]:
+                    break
+                column = spec["aggregates"][expr]
+                # Keep the base query's column name (the alias, or the expression text itself)
+                columns.append(f"{column} as {alias}" if alias else f'{column} as "{expr}"')
+                names[expr] = column
+                if alias:
+                    names[alias] = alias
+            else:
+                order_terms = []
+                for term in order[len(" order by "):].split(", ") if order else []:
+                    found = ORDER_ITEM.fullmatch(term)
+                    if found.group(1) not in names:
+                        break
+                    order_terms.append(names[found.group(1)] + found.group(2))
+                else:
+                    # Without ORDER BY a GROUP BY returns groups in key order; keep that explicit.
+                    # Otherwise the key breaks ties, as _with_tiebreak does for the base query.
+                    if all(ORDER_ITEM.fullmatch(term).group(1) != key for term in order_terms):
+                        order_terms.append(key)
+                    order_sql = " order by " + ", ".join(order_terms)
+                    return f"select {', '.join(columns)} from {view}{order_sql}{limit}", view
+        return None
+
+    def _rewrite_count_distinct(self, text, usable):
+        match = COUNT_DISTINCT.fullmatch(text)
+        if match is None:
+            return None
+        key, alias, table, limit = match.groups()
+        for view in usable:
+            spec = VIEWS[view]
+            if spec["table"] == table and spec["key"] == key:
+                alias = alias or f' as "count(distinct {key})"'
+                return f"select count({key}){alias} from {view}{limit}", view
+        return None
+
+    def _rewrite_count_all(self, text, usable):
+        match = COUNT_ALL.fullmatch(text)
+        if match is None:
+            return None
+        alias, table, limit = match.groups()
+        for view, info in usable.items():
+            spec = VIEWS[view]
+            if spec["table"] == table and not info["has_null_keys"]:
+                alias = alias or ' as "count(*)"'
+                return f"select coalesce(sum(row_count), 0){alias} from {view}{limit}", view
+        return None
+
+    def stats(self):
+        return {"usable_views": sorted(self._usable), "rewrites": self.rewrites}
+
+# Shared materializer used by app.execute_query
+materializer = Materializer()
+
+def main():
+    parser = argparse.ArgumentParser(description="Create/refresh the summary tables in combined.db and check them.")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch")
+    parser.add_argument("--check", action="store_true", help="also compare every group with the base table "
+                                                             "(a full GROUP BY per table; run periodically)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    try:
+        for view, info in refresh(conn, full=args.full).items():
+            print(f"{view:24s} {info['groups_updated']:8d} groups updated  watermark {info['watermark']}  "
+                  f"{info['ms']:.1f} ms  {'verified' if info['verified'] else 'NOT VERIFIED (run with --check)'}")
+        if args.check:
+            for view, info in check(conn).items():
+                status = "OK" if info["ok"] else f"MISMATCH {info.get('mismatches') or info.get('error')}"
+                print(f"{view:24s} check {status}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+
+# Latency histogram buckets in seconds (SQLite calls are sub-millisecond, LLM calls take seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "stage_seconds": "Time spent in each stage of the query pipeline.",
+    "llm_tokens_total": "Tokens reported by Together AI (output.usage).",
+    "sql_source_total": "Where the SQL for a question came from.",
+    "slow_queries_total": "Queries that ran longer than the slow query threshold.",
+}
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.started)
+        return False
+
+# Per-stage latency histograms, counters and a slow query log, exported in the Prometheus text format.
+# When disabled, stage() hands back a shared no-op context manager and the other calls return at once.
+class Metrics:
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS, slow_query_seconds=0.5, slow_query_log=None,
+                 max_slow_queries=100, prefix="sqlbot"):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.slow_query_seconds = slow_query_seconds
+        self.slow_query_log = slow_query_log  # Optional JSONL file slow queries are appended to
+        self.prefix = prefix
+        self._histograms = {}  # stage -> [bucket counts..., +Inf count, sum]
+        self._counters = {}  # (name, ((label, value), ...)) -> value
+        self._collectors = {}  # name -> fn returning a dict of numbers, exported as gauges
+        self._slow_queries = deque(maxlen=max_slow_queries)
+        self._lock = threading.Lock()
+
+    # Function to time a block: `with metrics.stage("llm_call"): ...`
+    def stage(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[bisect_left(self.buckets, seconds)] += 1  # First bucket with seconds <= bound, else +Inf
+            histogram[-1] += seconds
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    # Token counts from a Together AI response body ({"output": {"usage": {...}}}); "usage" may be missing
+    def record_usage(self, result):
+        if not self.enabled:
+            return
+        usage = (result.get("output") or {}).get("usage") or result.get("usage") or {}
+        for kind in ("prompt", "completion"):
+            tokens = usage.get(f"{kind}_tokens")
+            if isinstance(tokens, (int, float)):
+                self.inc("llm_tokens_total", tokens, kind=kind)
+
+    # Function to log a query that took longer than the threshold, with the plan it ran with
+    def slow_query(self, sql, params, seconds, plan=None, executed_sql=None):
+        if not self.enabled or seconds < self.slow_query_seconds:
+            return
+        entry = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "ms": round(seconds * 1000, 3),
+                 "sql": sql, "params": list(params), "plan": plan or []}
+        if executed_sql and executed_sql != sql:
+            entry["executed_sql"] = executed_sql
+        self.inc("slow_queries_total")
+        with self._lock:
+            self._slow_queries.append(entry)
+            if self.slow_query_log:
+                with open(self.slow_query_log, "a") as log:
+                    log.write(json.dumps(entry) + "\n")
+
+    def slow_queries(self):
+        with self._lock:
+            return list(self._slow_queries)
+
+    # Function to export the numeric values of a stats() dict as gauges named <prefix>_<name>_<key>
+    def add_collector(self, name, fn):
+        self._collectors[name] = fn
+
+    # Function to render everything in the Prometheus text exposition format
+    def render(self):
+        lines = []
+        with self._lock:
+            histograms = {name: list(values) for name, values in self._histograms.items()}
+            counters = dict(self._counters)
+        if histograms:
+            metric = f"{self.prefix}_stage_seconds"
+            lines += [f"# HELP {metric} {HELP['stage_seconds']}", f"# TYPE {metric} histogram"]
+            for stage in sorted(histograms):
+                values = histograms[stage]
+                cumulative = 0
+                for bound, count in zip(self.buckets + ("+Inf",), values):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {values[-1]:.6f}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {cumulative}')
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{self.prefix}_{name}"
+            lines += [f"# HELP {metric} {HELP.get(name, name)}", f"# TYPE {metric} counter"]
+            for (counter, labels), total in sorted(counters.items()):
+                if counter == name:
+                    label_text = ",".join(f'{label}="{label_value}"' for label, label_value in labels)
+                    lines.append(f"{metric}{{{label_text}}} {total}" if label_text else f"{metric} {total}")
+        for name, fn in self._collectors.items():
+            try:
+                stats = fn()
+            except Exception:  # A broken collector must not take /metrics down
+                continue
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    metric = f"{self.prefix}_{name}_{key}"
+                    lines += [f"# TYPE {metric} gauge", f"{metric} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+# Sampling profiler for hot-path analysis: a background thread records the stack of every other thread
+# each `interval` seconds. Output is folded stacks ("file:function;file:function count"), the input format
+# of flamegraph.pl and speedscope. Nothing runs unless a profile is being taken.
+class SamplingProfiler:
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            raise RuntimeError("profiler already running")
+        self._samples.clear()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.folded()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self._samples[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "\n".join(f"{stack} {count}" for stack, count in self._samples.most_common()) + "\n"
+
+# Shared metrics used by app.py; METRICS_ENABLED=0 turns all recording off
+metrics = Metrics(
+    enabled=os.environ.get("METRICS_ENABLED", "1") != "0",
+    slow_query_seconds=float(os.environ.get("SLOW_QUERY_MS", "500")) / 1000,
+    slow_query_log=os.environ.get("SLOW_QUERY_LOG"),
+)
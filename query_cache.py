@@ -0,0 +1,131 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Tokens that carry meaning: decimals, comparison operators (incl. !=), minus signs and words; other punctuation
+# (question and exclamation marks, commas, quotes) is dropped
+QUESTION_TOKEN = re.compile(r"\d*\.\d+|!=|[<>=]+|-|\w+")
+
+# Function to normalize a user question so trivially different phrasings share a cache entry
+# (case, whitespace and punctuation are folded, e.g. "Top 3 customers by revenue?" == "top 3 customers by  revenue",
+# but "revenue > 100" and "revenue < 100", or "above -50" and "above 50", stay apart)
+def normalize_question(text):
+    return " ".join(QUESTION_TOKEN.findall(text.lower()))
+
+# Function to get a cheap version stamp for the database file; it changes whenever the file is written.
+# In WAL mode commits land in the -wal file until a checkpoint, so that file is stamped too.
+def db_version(db_path):
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            version.append(None)
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version) if version[0] is not None else None
+
+# Thread-safe LRU cache with an optional TTL (in seconds) and hit/miss counters
+class LRUCache:
+    def __init__(self, max_size=256, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, stored_at = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                self.evictions += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            return entry[0] if entry else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+# SQL -> result cache that empties itself whenever the database file changes.
+# Results with more than max_rows rows are not cached so one large answer can't push everything else out.
+class ResultCache(LRUCache):
+    def __init__(self, db_path, max_size=128, ttl=None, max_rows=10000):
+        super().__init__(max_size=max_size, ttl=ttl)
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.invalidations = 0
+        self._version = db_version(db_path)
+
+    def _check_version(self):
+        version = db_version(self.db_path)
+        if version != self._version:
+            with self._lock:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._version = version
+
+    # Version of the database as seen now; pass it back to set() so a result read
+    # before a concurrent write is never stored under the newer version
+    def current_version(self):
+        self._check_version()
+        return self._version
+
+    # With version, only answer while the database is still at that version (e.g. a pinned read snapshot)
+    def get(self, key, default=None, version=None):
+        self._check_version()
+        if version is not None and version != self._version:
+            return default
+        return super().get(key, default)
+
+    def set(self, key, value, version=None):
+        if len(value.get("data", ())) > self.max_rows:
+            return
+        self._check_version()
+        if version is not None and version != self._version:
+            return
+        super().set(key, value)
+
+    def stats(self):
+        stats = super().stats()
+        stats["max_rows"] = self.max_rows
+        stats["invalidations"] = self.invalidations
+        return stats
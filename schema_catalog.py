@@ -0,0 +1,220 @@
+import threading
+
+from db_pool import pool as default_pool
+from query_cache import db_version, normalize_question
+from sql_guard import table_aliases
+
+# Introspected description of the database, built once and reused for every prompt.
+# For each table it keeps the columns, declared and inferred relationships, a few sample values and a
+# prebuilt prompt fragment, plus an inverted index (identifier/sample-value token -> tables) used to pick
+# only the tables a question is about. It is rebuilt only when PRAGMA schema_version changes.
+class SchemaCatalog:
+    def __init__(self, pool=default_pool, sample_size=3, max_indexed_values=50, max_value_length=40,
+                 max_related_tables=3):
+        self.pool = pool
+        self.sample_size = sample_size  # Sample values shown in the prompt per text column
+        self.max_indexed_values = max_indexed_values  # Low-cardinality text columns have all values indexed
+        self.max_value_length = max_value_length
+        self.max_related_tables = max_related_tables  # Tables select_tables() may add to the ones a question matches
+        self._lock = threading.Lock()
+        self._db_version = None
+        self._schema_version = None
+        self.tables = {}  # name -> {"columns": [...], "joins": [(table, text)], "references": [...], "values": {...}}
+        self.fragments = {}  # name -> prompt text (columns only; joins are added for the tables in a prompt)
+        self.index = {}  # token -> {table: weight}
+        self.refreshes = 0
+
+    # Function to rebuild the catalog if the schema changed; costs one os.stat() when the database is untouched
+    def refresh(self, force=False):
+        version = db_version(self.pool.db_path)
+        if not force and version == self._db_version and self.tables:
+            return False
+        with self._lock:
+            with self.pool.connection() as conn:
+                schema_version = conn.execute("PRAGMA schema_version;").fetchone()[0]
+                if not force and schema_version == self._schema_version and self.tables:
+                    self._db_version = version
+                    return False
+                tables = self._introspect(conn)
+            fragments = {name: self._build_fragment(name, info) for name, info in tables.items()}
+            index = self._build_index(tables)
+            # Swap everything at once so readers never see a half-built catalog
+            self.tables, self.fragments, self.index = tables, fragments, index
+            self._schema_version = schema_version
+            self._db_version = version
+            self.refreshes += 1
+            return True
+
+    def _introspect(self, conn):
+        # Summary tables (mv_*, see materialize.py) are an implementation detail the LLM shouldn't query
+        names = [row[0] for row in conn.execute(
+            "select name from sqlite_master where type = 'table' and name not like 'sqlite_%' "
+            "and name not like 'mv\\_%' escape '\\' order by name;")]
+        tables = {}
+        for name in names:
+            columns = [
+                {"name": row[1], "type": (row[2] or "").upper(), "pk": bool(row[5])}
+                for row in conn.execute(f'PRAGMA table_info("{name}");')
+            ]
+            foreign_keys = [
+                {"column": row[3], "table": row[2], "ref_column": row[4] or "rowid"}
+                for row in conn.execute(f'PRAGMA foreign_key_list("{name}");')
+            ]
+            values = {}
+            for column in columns:
+                if column["pk"] or column["type"] not in ("", "TEXT") or column["name"].endswith("_date"):
+                    continue
+                rows = conn.execute(
+                    f'select distinct "{column["name"]}" from "{name}" where "{column["name"]}" is not null '
+                    f'limit {self.max_indexed_values + 1};'
+                ).fetchall()
+                values[column["name"]] = [
+                    str(row[0]) for row in rows if len(str(row[0])) <= self.max_value_length
+                ]
+                if len(rows) > self.max_indexed_values:
+                    values[column["name"]] = values[column["name"]][:self.sample_size]
+            tables[name] = {"columns": columns, "foreign_keys": foreign_keys, "values": values, "joins": [],
+                            "references": []}
+
+        # Each relationship is recorded once, in both tables' "joins": declared foreign keys, plus
+        # "foreign-key-like" columns, the same non-key column name in two tables (e.g. orders.customer_name =
+        # sales.customer_name), which only count for joining the tables a question matched
+        seen = set()
+
+        def join(one, one_column, other, other_column):
+            ends = frozenset(((one, one_column), (other, other_column)))
+            if other not in tables or ends in seen:
+                return
+            seen.add(ends)
+            text = f"{one}.{one_column} = {other}.{other_column}"
+            tables[one]["joins"].append((other, text))
+            if other != one:
+                tables[other]["joins"].append((one, text))
+
+        for name, info in tables.items():
+            for fk in info["foreign_keys"]:
+                join(name, fk["column"], fk["table"], fk["ref_column"])
+                if fk["table"] in tables and fk["table"] != name and fk["table"] not in info["references"]:
+                    info["references"].append(fk["table"])
+        for name, info in tables.items():
+            own = {c["name"] for c in info["columns"] if not c["pk"]}
+            for other, other_info in tables.items():
+                if other <= name:
+                    continue
+                for column in sorted(own & {c["name"] for c in other_info["columns"] if not c["pk"]}):
+                    join(name, column, other, column)
+        return tables
+
+    def _build_fragment(self, name, info):
+        parts = []
+        for column in info["columns"]:
+            detail = column["type"] or "ANY"
+            if column["pk"]:
+                detail += ", primary key"
+            samples = info["values"].get(column["name"], [])[:self.sample_size]
+            if samples:
+                detail += ", e.g. " + ", ".join(f"'{value}'" for value in samples)
+            parts.append(f"{column['name']} ({detail})")
+        return f"Table: {name}\nColumns: {', '.join(parts)}\n"
+
+    # Function to list the relationships among the given tables, each once
+    def _joins_text(self, tables):
+        joins = []
+        for table in tables:
+            for other, text in self.tables.get(table, {}).get("joins", []):
+                if other in tables and text not in joins:
+                    joins.append(text)
+        return f"Joins: {'; '.join(joins)}\n" if joins else ""
+
+    # Function to find the tables between start and goal on the shortest join path (declared or shared-column)
+    def _join_path(self, start, goal):
+        previous = {start: None}
+        queue = [start]
+        for table in queue:
+            if table == goal:
+                path = []
+                while previous[table] not in (None, start):
+                    table = previous[table]
+                    path.append(table)
+                return path[::-1]
+            for other, _ in self.tables[table]["joins"]:
+                if other not in previous:
+                    previous[other] = table
+                    queue.append(other)
+        return []
+
+    def _build_index(self, tables):
+        index = {}
+
+        def add(token, table, weight):
+            for variant in (token, token[:-1] if len(token) > 3 and token.endswith("s") else token):
+                entry = index.setdefault(variant, {})
+                entry[table] = max(entry.get(table, 0), weight)
+
+        for name, info in tables.items():
+            for token in normalize_question(name.replace("_", " ")).split():
+                add(token, name, 3)
+            for column in info["columns"]:
+                for token in normalize_question(column["name"].replace("_", " ")).split():
+                    add(token, name, 2)
+            for values in info["values"].values():
+                for value in values:
+                    for token in normalize_question(value).split():
+                        add(token, name, 1)
+        # Tokens found in every table (e.g. "customer", "name") say nothing about which table is meant
+        if len(tables) > 1:
+            index = {token: entry for token, entry in index.items() if len(entry) < len(tables)}
+        return index
+
+    # Function to rank the tables a question refers to, followed by the tables needed to join them: those on the
+    # join path between the matched tables, then the tables their declared foreign keys reference (at most
+    # max_related_tables in all); falls back to every table when nothing matches
+    def select_tables(self, question):
+        self.refresh()
+        scores = {}
+        for token in normalize_question(question).split():
+            entry = self.index.get(token) or self.index.get(token[:-1] if token.endswith("s") else token, {})
+            for table, weight in entry.items():
+                scores[table] = scores.get(table, 0) + weight
+        if not scores:
+            return sorted(self.tables)
+        selected = sorted(scores, key=lambda table: (-scores[table], table))
+        related = [table for matched in selected[1:] for table in self._join_path(selected[0], matched)]
+        related += [table for matched in selected for table in self.tables[matched]["references"]]
+        for table in related:
+            if table not in selected and len(selected) < len(scores) + self.max_related_tables:
+                selected.append(table)
+        return selected
+
+    # Function to get the prebuilt prompt text for the tables relevant to a question, with the joins between them
+    def schema_prompt(self, question):
+        tables = self.select_tables(question)
+        return "\n".join(self.fragments[table] for table in tables) + "\n" + self._joins_text(tables)
+
+    # Function to look up the declared type of each result column of sql: a column named like a column of a table
+    # the query reads (revenue, s.revenue) gets that column's type; expressions, aliases and ambiguous names get ""
+    def column_types(self, sql, columns):
+        self.refresh()
+        declared = {}
+        for table in set(table_aliases(sql).values()):
+            for column in self.tables.get(table, {}).get("columns", []):
+                declared.setdefault(column["name"], set()).add(column["type"])
+        return [next(iter(declared[name])) if len(declared.get(name, ())) == 1 else "" for name in columns]
+
+    def fragment(self, table_name):
+        self.refresh()
+        if table_name not in self.fragments:
+            return f"Table: {table_name}\nColumns: \n"
+        joins = [text for _, text in self.tables[table_name]["joins"]]
+        return self.fragments[table_name] + (f"Joins: {'; '.join(joins)}\n" if joins else "")
+
+    def stats(self):
+        return {
+            "tables": len(self.tables),
+            "indexed_tokens": len(self.index),
+            "schema_version": self._schema_version,
+            "refreshes": self.refreshes,
+        }
+
+# Shared catalog used by app.py and backend.py
+catalog = SchemaCatalog()
@@ -0,0 +1,214 @@
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from db_pool import pool as default_pool
+from query_cache import db_version
+
+try:
+    import sqlglot
+    from sqlglot import exp
+except ImportError:  # Optional: without sqlglot the lexical check below is used
+    sqlglot = None
+
+# Statements and keywords that never belong in a read-only query
+FORBIDDEN = re.compile(
+    r"\b(insert|update|delete|replace\s+into|upsert|create|drop|alter|attach|detach|pragma|vacuum|reindex|analyze|"
+    r"begin|commit|rollback|savepoint|release|returning)\b"
+)
+# String literals, quoted identifiers and comments, which are blanked out before looking at keywords
+LITERALS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?\*/", re.S)
+TRAILING_LIMIT = re.compile(r"\blimit\s+(?:\d+|\?)(?:\s*(?:,|offset)\s*(?:\d+|\?))?\s*$")
+TABLE_ALIASES = re.compile(r"\b(?:from|join)\s+([a-z_]\w*)(?:\s+(?:as\s+)?([a-z_]\w*))?")
+COMMA_TABLES = re.compile(r",\s*([a-z_]\w*)(?:\s+(?:as\s+)?([a-z_]\w*))?")
+NOT_ALIASES = {"where", "join", "inner", "left", "right", "cross", "natural", "on", "using", "group",
+               "order", "limit", "union", "except", "intersect", "having", "window"}
+PLAN_STEP = re.compile(r"^(SCAN|SEARCH) (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$")
+
+# Function to map the names a query uses for its tables (aliases and bare names) to table names.
+# FROM/JOIN matches win over comma-list guesses.
+def table_aliases(sql):
+    aliases = {}
+    bare = LITERALS.sub(" ", sql).lower()
+    for pattern in (COMMA_TABLES, TABLE_ALIASES):
+        for table, alias in pattern.findall(bare):
+            aliases[table] = table
+            if alias and alias not in NOT_ALIASES:
+                aliases[alias] = table
+    return aliases
+
+# Pre-execution checks for generated SQL: single read-only SELECT, cost estimate from EXPLAIN QUERY PLAN,
+# an injected LIMIT, a wall-clock budget enforced with a progress handler, and a row cap.
+# Problems come back as {"error": ..., "error_type": "rejected" | "over_budget", "details": {...}}.
+class SQLGuard:
+    def __init__(self, pool=default_pool, max_rows=10000, time_budget=5.0, max_cost=1e8):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.time_budget = time_budget  # Seconds a single statement may run
+        self.max_cost = max_cost  # Estimated row visits above which a query is refused
+        self._row_counts = {}
+        self._row_counts_version = None
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.over_budget = 0
+
+    def _reject(self, message, **details):
+        self.rejected += 1
+        return {"error": message, "error_type": "rejected", "details": details}
+
+    def _over_budget(self, message, **details):
+        self.over_budget += 1
+        return {"error": message, "error_type": "over_budget", "details": details}
+
+    # Function to check that sql is one read-only SELECT and add a LIMIT if it has none.
+    # Returns {"sql": ..., "limit_injected": bool} or an error dict.
+    def validate(self, sql, inject_limit=True):
+        text = sql.strip().rstrip(";").strip()
+        if not text:
+            return self._reject("Empty SQL query.")
+        bare = " ".join(LITERALS.sub(" '' ", text).lower().split())
+        if ";" in bare:
+            return self._reject("Only a single SQL statement is allowed.")
+        if sqlglot is not None:
+            error = self._validate_ast(text)
+            if error is not None:
+                return error
+        if not (bare.startswith("select") or bare.startswith("with") or bare.startswith("(")):
+            return self._reject("Only SELECT queries are allowed.", statement=bare.split(" ", 1)[0])
+        forbidden = FORBIDDEN.search(bare)
+        if forbidden:
+            return self._reject("Only read-only SELECT queries are allowed.", keyword=forbidden.group(1))
+        limit_injected = False
+        if inject_limit and not TRAILING_LIMIT.search(bare):
+            # One extra row so the caller can tell the result was cut off
+            text = f"{text} limit {self.max_rows + 1}"
+            limit_injected = True
+        return {"sql": text, "limit_injected": limit_injected}
+
+    def _validate_ast(self, text):
+        try:
+            statements = [statement for statement in sqlglot.parse(text, read="sqlite") if statement is not None]
+        except sqlglot.errors.SqlglotError:
+            return None  # Leave syntax errors to SQLite; the lexical checks still apply
+        if len(statements) != 1:
+            return self._reject("Only a single SQL statement is allowed.")
+        statement = statements[0]
+        if not isinstance(statement, (exp.Select, exp.Union, exp.Intersect, exp.Except)):
+            return self._reject("Only SELECT queries are allowed.", statement=statement.key)
+        if statement.find(exp.Insert, exp.Update, exp.Delete, exp.Create, exp.Drop, exp.Command):
+            return self._reject("Only read-only SELECT queries are allowed.")
+        return None
+
+    # Approximate row counts (max rowid is a single b-tree seek), refreshed when the database changes.
+    # A snapshot connection may see older data than the file's current version, so it is not cached.
+    def _rows(self, conn, table, snapshot=False):
+        if snapshot:
+            return self._read_rows(conn, table)
+        version = db_version(self.pool.db_path) if self.pool is not None else None
+        with self._lock:
+            if version != self._row_counts_version:
+                self._row_counts = {}
+                self._row_counts_version = version
+            if table not in self._row_counts:
+                self._row_counts[table] = self._read_rows(conn, table)
+            return self._row_counts[table]
+
+    def _read_rows(self, conn, table):
+        try:
+            return conn.execute(f'select max(rowid) from "{table}";').fetchone()[0] or 0
+        except sqlite3.Error:
+            return 1000
+
+    # Function to run EXPLAIN QUERY PLAN and estimate the cost as row visits: scans cost the table size,
+    # indexed searches a handful of rows, and nested loop levels multiply. Flags full scans and unindexed joins.
+    # Pass snapshot=True when conn is a read transaction the caller holds open.
+    def assess(self, conn, sql, params=(), snapshot=False):
+        try:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        except sqlite3.Error as e:
+            return {"error": f"SQLite Error: {str(e)}"}
+        aliases = table_aliases(sql)
+
+        warnings = []
+        loops = {}  # parent id -> [estimated rows per nested loop level]
+        extra = 0.0
+        for _, parent, _, detail in plan:
+            step = PLAN_STEP.match(detail)
+            if step is None:
+                continue
+            kind, name, alias, rest = step.groups()
+            if name == "CONSTANT":  # SCAN CONSTANT ROW (select without a table)
+                continue
+            table = aliases.get((alias or name).lower(), name)
+            rows = self._rows(conn, table, snapshot)
+            if kind == "SCAN":
+                if " USING COVERING INDEX" not in rest and " USING INDEX" not in rest:
+                    warnings.append(f"full scan of {table}")
+                if loops.get(parent):
+                    warnings.append(f"nested full scan of {table} (cartesian or unindexed join)")
+                estimate = rows
+            elif "AUTOMATIC" in rest:
+                warnings.append(f"join on {table} has no index (SQLite builds a temporary one per query)")
+                extra += rows  # Building the automatic index reads the whole table
+                estimate = 10
+            elif "=" in rest and "<" not in rest and ">" not in rest:
+                estimate = 10
+            else:
+                estimate = max(1, rows / 4)  # Range search
+            loops.setdefault(parent, []).append(max(1, estimate))
+
+        cost = extra
+        for levels in loops.values():
+            product = 1.0
+            for estimate in levels:
+                product *= estimate
+            cost += product
+        plan_text = [row[3] for row in plan]
+        if cost > self.max_cost:
+            return self._over_budget(
+                f"Query is too expensive to run (estimated {cost:,.0f} row visits, limit {self.max_cost:,.0f}).",
+                estimated_cost=cost, warnings=warnings, plan=plan_text)
+        return {"estimated_cost": cost, "warnings": warnings, "plan": plan_text}
+
+    # Function to validate and assess a query on a pooled connection of its own (used before streaming)
+    def check(self, sql, params=(), inject_limit=False):
+        checked = self.validate(sql, inject_limit=inject_limit)
+        if "error" in checked:
+            return checked
+        try:
+            with self.pool.connection() as conn:
+                assessment = self.assess(conn, checked["sql"], params)
+        except sqlite3.Error as e:
+            return {"error": f"SQLite Error: {str(e)}"}
+        if "error" in assessment:
+            return assessment
+        return dict(assessment, sql=checked["sql"])
+
+    # Abort the statement once it has run for `seconds`; SQLite then raises OperationalError("interrupted")
+    @contextmanager
+    def budget(self, conn, seconds=None):
+        deadline = time.monotonic() + (seconds or self.time_budget)
+        conn.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 10000)
+        try:
+            yield
+        finally:
+            conn.set_progress_handler(None, 0)
+
+    def budget_error(self, seconds=None):
+        seconds = seconds or self.time_budget
+        return self._over_budget(f"Query exceeded the {seconds:g}s time budget and was stopped.", time_budget=seconds)
+
+    def stats(self):
+        return {
+            "max_rows": self.max_rows,
+            "time_budget": self.time_budget,
+            "max_cost": self.max_cost,
+            "parser": "sqlglot" if sqlglot is not None else "lexical",
+            "rejected": self.rejected,
+            "over_budget": self.over_budget,
+        }
+
+# Shared guard used by app.py
+guard = SQLGuard()
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from db_pool import pool
+from sql_guard import guard
+
+STREAM_MAX_CONCURRENCY = int(os.environ.get("STREAM_MAX_CONCURRENCY", "4"))  # Streams reading SQLite at once
+STREAM_IDLE_TIMEOUT = float(os.environ.get("STREAM_IDLE_TIMEOUT", "30"))  # Seconds a stalled client may hold a connection
+
+# Worker threads for /query/stream. A stream's thread waits on its client (backpressure), so streams get their own
+# executor rather than the default one that asyncio.to_thread (/query) uses; with max_streams threads they never hold
+# more than max_streams pooled connections. A stream whose client reads nothing for idle_timeout seconds is stopped
+# and its connection released.
+class StreamExecutor:
+    def __init__(self, max_streams=STREAM_MAX_CONCURRENCY, idle_timeout=STREAM_IDLE_TIMEOUT):
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="stream")
+        self._lock = threading.Lock()
+        self.active = 0
+        self.started = 0
+        self.rejected = 0
+        self.idle_timeouts = 0
+
+    # Function to check for a free stream slot before starting one; counts the refusal when there is none
+    def has_capacity(self):
+        with self._lock:
+            if self.active < self.max_streams:
+                return True
+            self.rejected += 1
+            return False
+
+    def _enter(self):
+        with self._lock:
+            self.active += 1
+            self.started += 1
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def _timed_out(self):
+        with self._lock:
+            self.idle_timeouts += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_streams": self.max_streams,
+                "idle_timeout": self.idle_timeout,
+                "active": self.active,
+                "started": self.started,
+                "rejected": self.rejected,
+                "idle_timeouts": self.idle_timeouts,
+            }
+
+# Shared stream executor used by app.py
+streams = StreamExecutor()
+
+# Function run in a worker thread: executes the SQL on a pooled connection and hands
+# ("columns", names), ("rows", batch)..., ("done", summary) or ("error", {"error": ...}) to the event loop
+# (or ("timeout", {"error": ...}) when the consumer stalls, see StreamExecutor).
+# At most `prefetch` batches are waiting at any time, so memory stays flat whatever the result size.
+# Sets `stalled` and gives up when the consumer takes nothing for idle_timeout seconds.
+# time_budget caps the seconds spent inside SQLite (execute and fetches, not waits on the consumer), as guard.budget
+# does for /query; running out is reported as the guard's over_budget error.
+def _produce(sql, params, batch_size, max_rows, emit, slots, cancelled, stalled, holder, holder_lock, idle_timeout,
+             time_budget=None):
+    if cancelled.is_set():
+        return  # The consumer went away while this stream was queued
+    spent = 0.0
+
+    def put(kind, value):
+        waiting_since = time.monotonic()
+        while not slots.acquire(timeout=0.1):
+            if cancelled.is_set():
+                return False
+            if time.monotonic() - waiting_since > idle_timeout:
+                stalled.set()  # The client stopped reading; give the connection back
+                return False
+        if cancelled.is_set():
+            return False
+        return emit(kind, value)
+
+    def step(conn, call, *args):
+        nonlocal spent
+        if time_budget is None:
+            return call(*args)
+        started = time.monotonic()
+        try:
+            with guard.budget(conn, max(time_budget - spent, 0.001)):
+                return call(*args)
+        finally:
+            spent += time.monotonic() - started
+
+    try:
+        with pool.connection() as conn:
+            with holder_lock:
+                holder.append(conn)  # Lets the consumer interrupt a long-running statement
+            try:
+                cursor = step(conn, conn.execute, sql, params)
+                if not put("columns", [desc[0] for desc in cursor.description]):
+                    return
+                sent = 0
+                while sent < max_rows and not cancelled.is_set():
+                    rows = step(conn, cursor.fetchmany, min(batch_size, max_rows - sent))
+                    if not rows:
+                        break
+                    sent += len(rows)
+                    if not put("rows", rows):
+                        return
+                truncated = sent >= max_rows and step(conn, cursor.fetchone) is not None
+                cursor.close()
+                put("done", {"row_count": sent, "truncated": truncated})
+            finally:
+                with holder_lock:
+                    holder.clear()
+    except sqlite3.Error as e:
+        if cancelled.is_set():
+            return
+        if str(e) == "interrupted" and time_budget is not None:
+            put("error", guard.budget_error(time_budget))
+        else:
+            put("error", {"error": f"SQLite Error: {str(e)}"})
+
+# Async generator over a query's rows in batches, read with fetchmany on a stream worker thread.
+# Stops early (and interrupts SQLite) if the consumer goes away or is_disconnected() says so.
+async def stream_rows(sql, batch_size=500, max_rows=100000, prefetch=2, params=(), is_disconnected=None,
+                      executor=streams, time_budget=None):
+    loop = asyncio.get_running_loop()
+    frames = asyncio.Queue()
+    slots = threading.Semaphore(prefetch)
+    cancelled = threading.Event()
+    stalled = threading.Event()
+    holder = []
+    holder_lock = threading.Lock()
+
+    def emit(kind, value):
+        try:
+            loop.call_soon_threadsafe(frames.put_nowait, (kind, value))
+            return True
+        except RuntimeError:  # Event loop already closed
+            return False
+
+    def produce():
+        try:
+            _produce(sql, params, batch_size, max_rows, emit, slots, cancelled, stalled, holder, holder_lock,
+                     executor.idle_timeout, time_budget)
+        finally:
+            executor._exit()
+        if stalled.is_set():
+            executor._timed_out()
+            # Past the hand-off limit on purpose: the consumer gets this once it reads again
+            emit("timeout", {"error": f"Stream stopped: the client read nothing for {executor.idle_timeout:g} seconds."})
+
+    executor._enter()  # Counted from here, so queued streams count against has_capacity() too
+    worker = loop.run_in_executor(executor._executor, produce)
+    try:
+        while True:
+            kind, value = await frames.get()
+            yield kind, value
+            slots.release()
+            if kind in ("done", "error", "timeout"):
+                break
+            if is_disconnected is not None and await is_disconnected():
+                break
+    finally:
+        cancelled.set()
+        with holder_lock:
+            for conn in holder:
+                conn.interrupt()
+        slots.release()  # Wake a producer blocked on a full hand-off
+        if worker.done():
+            worker.result()
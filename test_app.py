@@ -0,0 +1,215 @@
+import asyncio
+import io
+import json
+import sqlite3
+
+import pytest
+
+# Endpoint tests; app.py needs the web dependencies, so the whole module is skipped without them
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+pytest.importorskip("uvicorn")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import app  # noqa: E402
+from llm_client import LLMClient  # noqa: E402
+from query_cache import normalize_question  # noqa: E402
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app.app) as client:
+        yield client
+
+def total_sales(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("select sum(revenue) from sales").fetchone()[0]
+    finally:
+        conn.close()
+
+# /query
+
+def test_query_from_template_and_result_cache(client, db_path, add_sale):
+    first = client.get("/query", params={"query": "total sales"}).json()
+    assert first["results"]["columns"] == ["total_sales"]
+    hits = app.result_cache.hits
+    assert client.get("/query", params={"query": "Total sales?"}).json() == first
+    assert app.result_cache.hits == hits + 1
+
+    invalidations = app.result_cache.invalidations
+    add_sale(db_path, revenue=1000.0)
+    changed = client.get("/query", params={"query": "total sales"}).json()
+    assert app.result_cache.invalidations == invalidations + 1
+    assert changed["results"]["data"][0][0] == pytest.approx(total_sales(db_path))
+
+def test_query_through_the_llm(client):
+    calls = app.llm_client.calls
+    result = client.get("/query", params={"query": "revenue for each region"}).json()
+    assert result["sql"].startswith("select region, sum(revenue) as total_revenue from sales")
+    assert result["results"]["columns"] == ["region", "total_revenue"]
+    assert len(result["results"]["data"]) == 5
+    client.get("/query", params={"query": "Revenue for each region?"})
+    assert app.llm_client.calls == calls + 1  # The second ask comes from the SQL cache
+
+def test_templates_are_matched_off_the_event_loop(client, monkeypatch):
+    threads = []
+    match = app.matcher.match
+
+    def recording_match(question):
+        try:
+            asyncio.get_running_loop()
+            threads.append("event loop")
+        except RuntimeError:
+            threads.append("worker")
+        return match(question)
+
+    monkeypatch.setattr(app.matcher, "match", recording_match)
+    assert client.get("/query", params={"query": "total customers"}).status_code == 200
+    assert threads == ["worker"]
+
+def test_guard_rejection_drops_the_cached_sql(client):
+    key = normalize_question("clear out the sales table")
+    app.sql_cache.set(key, "delete from sales")
+    result = client.get("/query", params={"query": "clear out the sales table"}).json()
+    assert result["error_type"] == "rejected"
+    assert app.sql_cache.get(key) is None
+
+def test_query_formats(client):
+    response = client.get("/query", params={"query": "total customers", "format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.startswith("total_customers\r\n")
+    response = client.get("/query", params={"query": "total customers"},
+                          headers={"accept": "application/vnd.sqlbot.columnar+json"})
+    assert response.json()["results"]["arrays"][0][0] > 0
+    assert client.get("/query", params={"query": "total customers", "format": "xml"}).status_code == 406
+
+def test_blob_columns_are_sent_as_text(client):
+    app.sql_cache.set(normalize_question("blob please"), "select x'6162' as blob")
+    assert client.get("/query", params={"query": "blob please"}).json()["results"]["data"] == [["ab"]]
+    frames = ndjson(client.get("/query/stream", params={"query": "blob please"}))
+    assert frames[1]["rows"] == [["ab"]]
+
+def test_query_arrow(client):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    response = client.get("/query", params={"query": "top 3 customers by revenue", "format": "arrow"})
+    table = pa.ipc.open_stream(io.BytesIO(response.content)).read_all()
+    assert table.column_names == ["customer_name", "total_revenue"]
+    assert table.schema.field("total_revenue").type == pa.float64()
+    assert table.num_rows == 3
+
+def test_metrics_endpoint(client):
+    client.get("/query", params={"query": "total customers"})
+    text = client.get("/metrics").text
+    for stage in ("total", "guard", "rewrite", "sqlite_execute", "serialize"):
+        assert f'sqlbot_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'sqlbot_sql_source_total{source="template"}' in text
+
+def test_guard_is_observed_once_per_query(client):
+    def count(stage):
+        prefix = f'sqlbot_stage_seconds_count{{stage="{stage}"}} '
+        return next((int(line[len(prefix):]) for line in app.metrics.render().splitlines() if line.startswith(prefix)), 0)
+
+    before = {stage: count(stage) for stage in ("guard", "rewrite")}
+    assert "error" not in app.execute_query("select count(*) from sales", "sales")
+    assert "error" in app.execute_query("delete from sales", "sales")  # Rejected by validation, never rewritten
+    assert count("guard") == before["guard"] + 2
+    assert count("rewrite") == before["rewrite"] + 1
+
+# /query/batch
+
+def test_batch_keeps_order_and_answers_duplicates_once(client):
+    calls = app.llm_client.calls
+    questions = ["Average order per product?", "total customers", "average order per product", "Total customers!"]
+    body = client.post("/query/batch", json={"questions": questions}).json()
+    assert body["unique_questions"] == 2
+    assert [item["question"] for item in body["results"]] == questions
+    assert body["results"][0]["results"] == body["results"][2]["results"]
+    assert body["results"][1]["results"]["columns"] == ["total_customers"]
+    assert app.llm_client.calls == calls + 1
+
+def test_batch_too_large(client, monkeypatch):
+    monkeypatch.setattr(app, "BATCH_MAX_QUESTIONS", 2)
+    response = client.post("/query/batch", json={"questions": ["total sales"] * 3})
+    assert response.status_code == 413
+    assert "limit is 2" in response.json()["error"]
+
+def test_batch_snapshot_results_are_not_cached_after_a_write(client, db_path, add_sale, monkeypatch):
+    app.result_cache.clear()  # So the batch runs its SQL instead of answering from an earlier test's result
+    before = total_sales(db_path)
+    execute_query = app.execute_query
+
+    # A write lands while the batch runs its first question; the second still reads the batch's snapshot
+    def execute_after_write(*args, **kwargs):
+        monkeypatch.setattr(app, "execute_query", execute_query)
+        result = execute_query(*args, **kwargs)
+        add_sale(db_path, revenue=500.0)
+        return result
+
+    monkeypatch.setattr(app, "execute_query", execute_after_write)
+    body = client.post("/query/batch", json={"questions": ["total customers", "total sales"]}).json()
+    assert body["results"][1]["results"]["data"][0][0] == pytest.approx(before)
+    after = client.get("/query", params={"query": "total sales"}).json()
+    assert after["results"]["data"][0][0] == pytest.approx(before + 500.0)
+
+# /query/stream
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+def test_stream_frames(client):
+    frames = ndjson(client.get("/query/stream", params={"query": "who sold more than 100", "batch_size": 100}))
+    assert frames[0]["columns"] == ["customer_name"]
+    rows = sum(len(frame["rows"]) for frame in frames if "rows" in frame)
+    assert rows > 100
+    assert frames[-1] == {"row_count": rows, "truncated": False, "done": True}
+
+def test_stream_time_budget(client, monkeypatch, endless_sql):
+    monkeypatch.setattr(app.guard, "time_budget", 0.3)
+    key = normalize_question("count forever")
+    app.sql_cache.set(key, endless_sql)
+    frames = ndjson(client.get("/query/stream", params={"query": "count forever"}))
+    assert frames[-1]["error_type"] == "over_budget"
+    assert app.sql_cache.get(key) is None
+
+def test_stream_refused_when_all_slots_are_busy(client, monkeypatch):
+    monkeypatch.setattr(app.streams, "max_streams", 0)
+    response = client.get("/query/stream", params={"query": "total sales"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+# LLM client
+
+def test_llm_client_coalesces_identical_calls(llm_url):
+    async def run():
+        client = LLMClient(llm_url, {"content-type": "application/json"}, max_concurrency=2)
+        try:
+            payload = {"prompt": "User Query: orders per product"}
+            results = await asyncio.gather(
+                *(client.complete("orders", payload) for _ in range(5)),
+                client.complete("regions", {"prompt": "User Query: revenue by region"}),
+            )
+        finally:
+            await client.aclose()
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert client.stats()["calls"] == 2
+    assert client.stats()["coalesced"] == 4
+    assert all(result == results[0] for result in results[:5])
+    assert results[0]["result"]["output"]["choices"][0]["text"] == "select count(*) as total_orders from orders;"
+    assert "region" in results[5]["result"]["output"]["choices"][0]["text"]
+
+def test_llm_client_timeout(llm_url):
+    async def run():
+        client = LLMClient(llm_url, {}, timeout=0.05)
+        try:
+            return client, await client.complete("slow", {"prompt": "User Query: anything"})
+        finally:
+            await client.aclose()
+
+    client, result = asyncio.run(run())
+    assert result["error"].startswith("API Error: no response within")
+    assert client.timeouts == 1
@@ -0,0 +1,36 @@
+import sqlite3
+
+import generate_data
+import mock_llm_server
+import run_benchmarks
+
+def test_generate_data(tmp_path):
+    path = str(tmp_path / "bench.db")
+    info = generate_data.generate(path, 500, seed=7)
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("select count(*) from sales").fetchone()[0] == 500
+        assert conn.execute("select count(*) from orders").fetchone()[0] == 500
+        assert conn.execute("select count(distinct customer_name) from sales").fetchone()[0] <= info["customers"]
+        first = conn.execute("select * from sales order by id limit 5").fetchall()
+    finally:
+        conn.close()
+    generate_data.generate(path, 500, seed=7)  # Same seed, same data
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("select * from sales order by id limit 5").fetchall() == first
+    finally:
+        conn.close()
+
+def test_mock_llm_canned_sql():
+    assert mock_llm_server.canned_sql("User Query: who bought laptop").endswith("where o.product = 'laptop';")
+    assert "limit 7" in mock_llm_server.canned_sql("User Query: Top 7 customers")
+    assert mock_llm_server.canned_sql("no question here") == mock_llm_server.DEFAULT_SQL
+
+def test_summarize_and_compare():
+    summary = run_benchmarks.summarize([0.001, 0.002, 0.003, 0.004], elapsed=0.01)
+    assert summary["count"] == 4 and summary["p50_ms"] == 3.0 and summary["max_ms"] == 4.0
+    baseline = {"results": {"a": {"p50_ms": 1.0}, "b": {"p50_ms": 1.0}}}
+    current = {"results": {"a": {"p50_ms": 1.05}, "b": {"p50_ms": 1.5}, "new": {"p50_ms": 9.0}}}
+    regressions = run_benchmarks.compare(current, baseline, threshold=0.1)
+    assert [item["benchmark"] for item in regressions] == ["b"]
@@ -0,0 +1,99 @@
+import sqlite3
+
+import pytest
+
+import bulk_load
+import materialize
+
+def write_sales_csv(path, first_id, count):
+    with open(path, "w") as f:
+        f.write("id,customer_name,revenue,region,sale_date\n")
+        for i in range(first_id, first_id + count):
+            f.write(f"{i},Customer {i % 50},{i % 100}.5,North,2024-01-02\n")
+    return str(path)
+
+def index_names(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute("select name from sqlite_master where type = 'index' and sql is not null")]
+    finally:
+        conn.close()
+
+def test_bulk_load_defers_indexes_only_for_large_loads(tmp_path):
+    path = str(tmp_path / "load.db")
+    conn = sqlite3.connect(path)
+    conn.execute(bulk_load.TABLES["sales"]["schema"])
+    conn.execute("create index idx_sales_customer_name on sales (customer_name)")
+    conn.close()
+
+    report = bulk_load.load("sales", [write_sales_csv(tmp_path / "first.csv", 1, 1000)], db_path=path,
+                            refresh_views=False)
+    assert report["inserted"] == 1000 and report["indexes_deferred"]  # Empty table
+    report = bulk_load.load("sales", [write_sales_csv(tmp_path / "small.csv", 1001, 100)], db_path=path,
+                            refresh_views=False)
+    assert report["inserted"] == 100 and not report["indexes_deferred"]
+    report = bulk_load.load("sales", [write_sales_csv(tmp_path / "large.csv", 1101, 800)], db_path=path,
+                            refresh_views=False)
+    assert report["inserted"] == 800 and report["indexes_deferred"]
+    assert index_names(path) == ["idx_sales_customer_name"]
+
+def test_bulk_load_skips_rows_below_the_watermark(tmp_path):
+    path = str(tmp_path / "load.db")
+    source = write_sales_csv(tmp_path / "sales.csv", 1, 200)
+    assert bulk_load.load("sales", [source], db_path=path, refresh_views=False)["inserted"] == 200
+    report = bulk_load.load("sales", [source], db_path=path, refresh_views=False)
+    assert report["inserted"] == 0 and report["skipped"] == 200
+
+def test_bulk_load_rejects_invalid_rows_and_keeps_indexes(tmp_path):
+    path = str(tmp_path / "load.db")
+    conn = sqlite3.connect(path)
+    conn.execute(bulk_load.TABLES["sales"]["schema"])
+    conn.execute("create index idx_sales_region on sales (region)")
+    conn.close()
+    source = tmp_path / "bad.csv"
+    source.write_text("id,customer_name,revenue,region,sale_date\n1,Alice,12.5,North,2024-01-02\n2,Bob,lots,,2024-01-02\n")
+    with pytest.raises(ValueError, match="invalid rows"):
+        bulk_load.load("sales", [str(source)], db_path=path, refresh_views=False)
+    assert index_names(path) == ["idx_sales_region"]
+
+def test_deferred_indexes_stay_visible_until_the_load_commits(tmp_path):
+    path = str(tmp_path / "load.db")
+    conn = sqlite3.connect(path)
+    conn.execute(bulk_load.TABLES["sales"]["schema"])
+    conn.execute("create index idx_sales_region on sales (region)")
+    conn.close()
+    seen = []
+    report = bulk_load.load("sales", [write_sales_csv(tmp_path / "sales.csv", 1, 1000)], db_path=path, chunk_size=100,
+                            commit_rows=200, refresh_views=False,
+                            progress=lambda report, seconds: seen.append(index_names(path)))
+    assert report["indexes_deferred"]
+    assert seen == [["idx_sales_region"]] * 10  # Readers never see the table without its index
+
+def test_a_failed_load_with_deferred_indexes_leaves_the_table_unchanged(tmp_path):
+    path = str(tmp_path / "load.db")
+    conn = sqlite3.connect(path)
+    conn.execute(bulk_load.TABLES["sales"]["schema"])
+    conn.execute("create index idx_sales_region on sales (region)")
+    conn.close()
+    source = tmp_path / "bad.csv"
+    write_sales_csv(source, 1, 500)
+    with open(source, "a") as f:
+        f.write("501,Bob,lots,North,2024-01-02\n")
+    with pytest.raises(ValueError, match="invalid rows"):
+        bulk_load.load("sales", [str(source)], db_path=path, chunk_size=100, commit_rows=200, defer_indexes=True,
+                       refresh_views=False)
+    conn = sqlite3.connect(path)
+    assert conn.execute("select count(*) from sales").fetchone()[0] == 0
+    conn.close()
+    assert index_names(path) == ["idx_sales_region"]
+
+def test_bulk_load_leaves_summary_tables_verified(tmp_path):
+    path = str(tmp_path / "load.db")
+    bulk_load.load("sales", [write_sales_csv(tmp_path / "first.csv", 1, 200)], db_path=path)
+    conn = sqlite3.connect(path)
+    materialize.refresh(conn, ["mv_sales_by_region", "mv_sales_by_customer"])
+    report = bulk_load.load("sales", [write_sales_csv(tmp_path / "next.csv", 201, 50)], db_path=path)
+    assert all(info["verified"] for info in report["views"].values())
+    sql, view = materialize.Materializer(path).rewrite(conn, "select count(*) from sales")
+    assert view is not None and conn.execute(sql).fetchone()[0] == 250
+    conn.close()
@@ -0,0 +1,39 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool
+
+def test_connections_are_read_only(pool):
+    with pool.connection() as conn:
+        assert conn.execute("select count(*) from sales").fetchone()[0] > 0
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("delete from sales")
+
+def test_connections_are_reused(pool):
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert stats["open"] == 1 and stats["acquisitions"] == 2 and stats["in_use"] == 0
+
+def test_pool_is_bounded(db_path):
+    pool = ConnectionPool(db_path, max_connections=1, timeout=0.2)
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError, match="exhausted"):
+        pool.acquire()
+    released = threading.Timer(0.05, pool.release, (conn,))
+    released.start()
+    pool.timeout = 2.0
+    assert pool.acquire() is conn  # A waiter gets the connection as soon as it is released
+    assert pool.stats()["waits"] == 1
+    pool.release(conn)
+    pool.close_all()
+
+def test_release_rolls_back_open_transactions(pool):
+    with pool.connection() as conn:
+        conn.execute("begin")
+        conn.execute("select 1").fetchone()
+    assert not conn.in_transaction
@@ -0,0 +1,79 @@
+import io
+
+import pytest
+
+import encoders
+from encoders import CSVEncoder, columnar, dumps, iter_encoded, negotiate
+
+def test_dumps_is_compact():
+    assert dumps({"a": [1, 2.5, None]}) == b'{"a":[1,2.5,null]}'
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_dumps_encodes_blobs_as_text(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(encoders, "orjson", None)
+    elif encoders.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert dumps({"data": [(b"ab", b"\xff\x00")]}) == b'{"data":[["ab","/wA="]]}'
+
+def test_csv_encoder():
+    body = b"".join(iter_encoded(CSVEncoder(["name", "revenue"]), [("Alice, Jr.", 1.5), ("Bob", None)]))
+    assert body == b'name,revenue\r\n"Alice, Jr.",1.5\r\nBob,\r\n'
+
+def test_columnar():
+    results = columnar({"columns": ["a", "b"], "data": [(1, "x"), (2, "y")], "truncated": True})
+    assert results == {"columns": ["a", "b"], "arrays": [[1, 2], ["x", "y"]], "truncated": True}
+    assert columnar({"columns": ["a"], "data": []})["arrays"] == [[]]
+
+@pytest.mark.parametrize("format_name, accept, expected", [
+    ("CSV", None, "csv"),
+    ("xml", None, None),
+    (None, None, "json"),
+    (None, "text/csv;q=0.5, application/vnd.apache.arrow.stream", "arrow"),
+    (None, "text/html, */*;q=0.1", "json"),
+    (None, "text/csv;q=0", "json"),
+])
+def test_negotiate(format_name, accept, expected):
+    assert negotiate(format_name, accept) == expected
+
+# Arrow needs pyarrow; these are skipped without it
+
+def read_arrow(body):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+
+    return pa.ipc.open_stream(io.BytesIO(body)).read_all()
+
+def test_arrow_keeps_floats_after_integer_rows():
+    pytest.importorskip("pyarrow")
+    from encoders import ArrowEncoder
+
+    rows = [(1,), (2,), (1.5,)]
+    table = read_arrow(b"".join(iter_encoded(ArrowEncoder(["revenue"]), rows, batch_size=2)))
+    assert table.column("revenue").to_pylist() == [1.0, 2.0, 1.5]
+
+def test_arrow_widens_integers_in_real_columns_across_batches():
+    pytest.importorskip("pyarrow")
+    from encoders import ArrowEncoder
+
+    encoder = ArrowEncoder(["revenue"], ["REAL"])
+    body = encoder.begin() + encoder.encode([(1,), (2,)]) + encoder.encode([(2.5,)]) + encoder.end()
+    assert read_arrow(body).column("revenue").to_pylist() == [1.0, 2.0, 2.5]
+
+def test_arrow_refuses_a_type_change_mid_stream():
+    pytest.importorskip("pyarrow")
+    from encoders import ArrowEncoder
+
+    encoder = ArrowEncoder(["value"])
+    encoder.begin()
+    encoder.encode([(1,)])
+    with pytest.raises(ValueError, match="no longer fits"):
+        encoder.encode([("one",)])
+
+def test_arrow_empty_result_uses_declared_types():
+    pa = pytest.importorskip("pyarrow")
+    from encoders import ArrowEncoder
+
+    table = read_arrow(b"".join(iter_encoded(ArrowEncoder(["id", "name", "x"], ["INTEGER", "TEXT", ""]), [])))
+    assert table.num_rows == 0
+    assert [field.type for field in table.schema] == [pa.int64(), pa.string(), pa.string()]
@@ -0,0 +1,47 @@
+from db_pool import ConnectionPool
+from index_advisor import IndexAdvisor, driving_access, query_shape
+
+def test_query_shape():
+    assert query_shape("select * from sales where revenue > 100 and region = 'North'") == \
+        query_shape("SELECT *   FROM sales WHERE revenue > 2.5 AND region = 'South'")
+
+def test_driving_access():
+    assert driving_access(["SEARCH s USING INDEX idx (customer_name=?)"]) == "search"
+    assert driving_access(["SEARCH s USING INDEX idx (ANY(customer_name) AND revenue>?)"]) == "skip scan"
+    assert driving_access(["SCAN s USING COVERING INDEX idx", "SEARCH o USING INDEX i (x=?)"]) == "covering scan"
+    assert driving_access(["SCAN sales"]) == "scan"
+    assert driving_access([]) is None
+
+def test_record_groups_by_shape(pool):
+    advisor = IndexAdvisor(pool)
+    advisor.record("select * from sales where revenue > 100", seconds=0.002)
+    advisor.record("select * from sales where revenue > 200", seconds=0.004)
+    (entry,) = advisor.workload()
+    assert entry["count"] == 2
+
+def test_overlapping_recommendations_are_merged(pool):
+    workload = [
+        {"sql": "select customer_name, revenue from sales where customer_name = 'Alice Smith' and revenue > 10",
+         "count": 3},
+        {"sql": "select customer_name, revenue from sales where revenue = 10 and customer_name > 'A'", "count": 1},
+    ]
+    with pool.connection() as conn:
+        recommendations = IndexAdvisor(pool).recommend(conn, workload)
+    assert len(recommendations) == 1
+    assert recommendations[0]["columns"] == ["customer_name", "revenue"]
+    assert len(recommendations[0]["queries"]) == 2
+
+def test_apply_reports_the_driving_table_and_drops_unused_indexes(scratch_db):
+    pool = ConnectionPool(scratch_db)
+    advisor = IndexAdvisor(pool)
+    workload = [{"sql": "select revenue from sales where customer_name = 'Alice Smith'", "count": 1}]
+    with pool.connection() as conn:
+        recommendations = advisor.recommend(conn, workload)
+    unused = {"name": "idx_unused", "sql": "create index idx_unused on orders (order_date)"}
+    report = advisor.apply(scratch_db, recommendations + [unused], workload, repeat=1)
+    pool.close_all()
+    query = report["queries"][0]
+    assert query["before"]["driving"] == "scan"
+    assert query["after"]["driving"] == "search"
+    assert query["improved"]
+    assert [index["name"] for index in report["unused"]] == ["idx_unused"]
@@ -0,0 +1,31 @@
+import pytest
+
+from intent_matcher import IntentMatcher, normalize
+
+@pytest.mark.parametrize("question, intent, params", [
+    ("Top five customers by revenue?", "top_customers", [5]),
+    ("show me the top 10 customers by total revenue", "top_customers", [10]),
+    ("top customers by revenue", "top_customers", [3]),
+    ("Who bought monitors?", "who_bought", ["monitor"]),
+    ("which customer ordered a laptop", "who_bought", ["laptop"]),
+    ("who sold more than 100.5", "sold_more_than", [100.5]),
+    ("How many customers are there?", "total_customers", []),
+])
+def test_intent_slots(pool, question, intent, params):
+    matched = IntentMatcher(pool).match(question)
+    assert matched["intent"] == intent
+    assert matched["params"] == params
+
+@pytest.mark.parametrize("question", ["who bought spaceships", "top many customers by revenue", "revenue by region"])
+def test_unmatched_questions_go_to_the_llm(pool, question):
+    assert IntentMatcher(pool).match(question) is None
+
+def test_normalize_keeps_decimal_points():
+    assert normalize("Who sold more than 100.5?") == "who sold more than 100.5"
+
+def test_template_sql_runs(pool):
+    matcher = IntentMatcher(pool)
+    matched = matcher.match("who bought a monitor")
+    with pool.connection() as conn:
+        assert conn.execute(matched["sql"], matched["params"]).fetchall()
+    assert matcher.stats()["intents"] == {"who_bought": 1}
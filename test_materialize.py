@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+import bulk_load
+import materialize
+
+REGION_SQL = "select region, sum(revenue) as total_revenue from sales group by region order by total_revenue desc"
+
+# Function to open the database with the given summary tables refreshed and checked
+def materialized(path, views=("mv_sales_by_region",)):
+    conn = sqlite3.connect(path)
+    materialize.refresh(conn, list(views))
+    assert all(info["ok"] for info in materialize.check(conn, list(views)).values())
+    return conn
+
+def test_materialized_view_passes_check_and_is_used(scratch_db):
+    conn = materialized(scratch_db)
+    sql, view = materialize.Materializer(scratch_db).rewrite(conn, REGION_SQL)
+    assert view == "mv_sales_by_region"
+    assert conn.execute(sql).fetchall() == conn.execute(REGION_SQL + ", region").fetchall()
+
+def test_count_rewrites(scratch_db):
+    conn = materialized(scratch_db, ["mv_sales_by_region", "mv_sales_by_customer"])
+    materializer = materialize.Materializer(scratch_db)
+    for sql in ("select count(*) as total from sales", "select count(distinct customer_name) from sales"):
+        rewritten, view = materializer.rewrite(conn, sql)
+        assert view is not None
+        assert conn.execute(rewritten).fetchall() == conn.execute(sql).fetchall()
+
+def test_appended_rows_make_the_view_stale_until_refreshed(scratch_db, add_sale):
+    conn = materialized(scratch_db)
+    add_sale(scratch_db, region="North")
+    materializer = materialize.Materializer(scratch_db)
+    assert materializer.rewrite(conn, REGION_SQL)[1] is None
+    report = materialize.refresh(conn, ["mv_sales_by_region"])["mv_sales_by_region"]
+    assert report["groups_updated"] == 1 and report["verified"]
+    assert materializer.rewrite(conn, REGION_SQL)[1] == "mv_sales_by_region"  # No full check needed
+
+def test_check_reports_a_summary_that_drifted(scratch_db):
+    conn = materialized(scratch_db)
+    conn.execute("update mv_sales_by_region set total_revenue = total_revenue + 1 where region = 'North'")
+    conn.commit()
+    report = materialize.check(conn, ["mv_sales_by_region"])["mv_sales_by_region"]
+    assert not report["ok"]
+    assert report["mismatches"][0]["key"] == "North"
+    assert materialize.Materializer(scratch_db).rewrite(conn, REGION_SQL)[1] is None
+    conn.execute("insert into sales (customer_name, revenue, region, sale_date) "
+                 "values ('Test Customer', 10.0, 'South', '2024-01-01')")
+    conn.commit()
+    assert not materialize.refresh(conn, ["mv_sales_by_region"])["mv_sales_by_region"]["verified"]  # North not recomputed
+    assert materialize.refresh(conn, ["mv_sales_by_region"], full=True)["mv_sales_by_region"]["verified"]
+
+@pytest.mark.parametrize("write", [
+    "update sales set revenue = revenue + 1000 where id = 5",
+    "update sales set region = 'Elsewhere' where id = 5",
+    "delete from sales where id = 5",
+])
+def test_updates_and_deletes_are_tracked(scratch_db, write):
+    conn = materialized(scratch_db)
+    conn.execute(write)
+    conn.commit()
+    materializer = materialize.Materializer(scratch_db)
+    assert materializer.rewrite(conn, REGION_SQL)[1] is None  # Queued in mv_dirty until the next refresh
+    assert materialize.refresh(conn, ["mv_sales_by_region"])["mv_sales_by_region"]["verified"]
+    assert materialize.check(conn, ["mv_sales_by_region"])["mv_sales_by_region"]["ok"]
+    sql, view = materializer.rewrite(conn, REGION_SQL)
+    assert view == "mv_sales_by_region"
+    assert conn.execute(sql).fetchall() == conn.execute(REGION_SQL + ", region").fetchall()
+
+def test_inserts_below_the_watermark_are_tracked(scratch_db):
+    conn = materialized(scratch_db)
+    conn.execute("delete from sales where id = 5")
+    materialize.refresh(conn, ["mv_sales_by_region"])
+    conn.execute("insert into sales (id, customer_name, revenue, region, sale_date) "
+                 "values (5, 'Back Filled', 99999, 'South', '2024-01-01')")
+    conn.commit()
+    materialize.refresh(conn, ["mv_sales_by_region"])
+    assert materialize.check(conn, ["mv_sales_by_region"])["mv_sales_by_region"]["ok"]
+
+def test_ties_are_broken_by_the_group_key_on_both_paths(tmp_path):
+    path = str(tmp_path / "ties.db")
+    conn = sqlite3.connect(path)
+    conn.execute(bulk_load.TABLES["sales"]["schema"])
+    conn.executemany("insert into sales (customer_name, revenue, region, sale_date) values ('x', ?, ?, '2024-01-01')",
+                     [(10.0, "West"), (10.0, "East"), (10.0, "North"), (5.0, "South")])
+    conn.commit()
+    sql = REGION_SQL + " limit 2"
+    base_sql, view = materialize.Materializer(path).rewrite(conn, sql)
+    assert view is None and base_sql.endswith("order by total_revenue desc, region limit 2")
+    materialize.refresh(conn, ["mv_sales_by_region"])
+    view_sql, view = materialize.Materializer(path).rewrite(conn, sql)
+    assert view == "mv_sales_by_region"
+    expected = [("East", 10.0), ("North", 10.0)]
+    assert conn.execute(base_sql).fetchall() == expected
+    assert conn.execute(view_sql).fetchall() == expected
+
+def test_a_pinned_snapshot_does_not_decide_for_later_queries(scratch_db, add_sale):
+    materialized(scratch_db).close()
+    materializer = materialize.Materializer(scratch_db)
+    snapshot = sqlite3.connect(scratch_db, isolation_level=None)
+    snapshot.execute("begin")
+    snapshot.execute("select count(*) from sqlite_master").fetchone()
+    add_sale(scratch_db, region="North")
+    assert materializer.rewrite(snapshot, REGION_SQL, snapshot=True)[1] == "mv_sales_by_region"  # Fresh in the snapshot
+    snapshot.rollback()
+    conn = sqlite3.connect(scratch_db)
+    assert materializer.rewrite(conn, REGION_SQL)[1] is None
@@ -0,0 +1,39 @@
+from metrics import NULL_TIMER, Metrics
+
+def test_stage_histogram():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    metrics.observe("llm_call", 0.005)
+    metrics.observe("llm_call", 0.05)
+    metrics.observe("llm_call", 5.0)
+    text = metrics.render()
+    assert 'sqlbot_stage_seconds_bucket{stage="llm_call",le="0.01"} 1' in text
+    assert 'sqlbot_stage_seconds_bucket{stage="llm_call",le="0.1"} 2' in text
+    assert 'sqlbot_stage_seconds_bucket{stage="llm_call",le="+Inf"} 3' in text
+    assert 'sqlbot_stage_seconds_count{stage="llm_call"} 3' in text
+
+def test_counters_usage_and_collectors():
+    metrics = Metrics()
+    metrics.inc("sql_source_total", source="llm")
+    metrics.record_usage({"output": {"usage": {"prompt_tokens": 120, "completion_tokens": 30}}})
+    metrics.add_collector("pool", lambda: {"in_use": 2, "name": "ignored"})
+    metrics.add_collector("broken", lambda: 1 / 0)
+    text = metrics.render()
+    assert 'sqlbot_sql_source_total{source="llm"} 1' in text
+    assert 'sqlbot_llm_tokens_total{kind="prompt"} 120' in text
+    assert "sqlbot_pool_in_use 2.0" in text
+    assert "ignored" not in text
+
+def test_slow_query_log(tmp_path):
+    log = tmp_path / "slow.jsonl"
+    metrics = Metrics(slow_query_seconds=0.1, slow_query_log=str(log))
+    metrics.slow_query("select 1", (), 0.05)
+    metrics.slow_query("select 2", (), 0.5, plan=["SCAN sales"], executed_sql="select 2 limit 10")
+    (entry,) = metrics.slow_queries()
+    assert entry["sql"] == "select 2" and entry["executed_sql"] == "select 2 limit 10"
+    assert len(log.read_text().splitlines()) == 1
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    assert metrics.stage("guard") is NULL_TIMER
+    metrics.inc("sql_source_total", source="llm")
+    assert metrics.render() == "\n"
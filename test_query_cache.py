@@ -0,0 +1,45 @@
+from query_cache import LRUCache, ResultCache, normalize_question
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_result_cache_empties_when_database_changes(scratch_db, add_sale):
+    cache = ResultCache(scratch_db)
+    cache.set("select 1", {"columns": ["1"], "data": [(1,)]})
+    assert cache.get("select 1") is not None
+    add_sale(scratch_db)
+    assert cache.get("select 1") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_result_cache_refuses_results_from_an_older_version(scratch_db, add_sale):
+    cache = ResultCache(scratch_db)
+    version = cache.current_version()
+    add_sale(scratch_db)
+    cache.set("select 1", {"columns": ["1"], "data": [(1,)]}, version=version)
+    assert cache.get("select 1") is None
+    cache.set("select 1", {"columns": ["1"], "data": [(1,)]})
+    assert cache.get("select 1", version=version) is None  # A snapshot pinned before the write
+    assert cache.get("select 1", version=cache.current_version()) is not None
+
+def test_result_cache_skips_large_results(scratch_db):
+    cache = ResultCache(scratch_db, max_rows=2)
+    cache.set("big", {"columns": ["x"], "data": [(1,), (2,), (3,)]})
+    assert cache.get("big") is None
+
+def test_normalize_question():
+    assert normalize_question("Top 3 customers by revenue?") == normalize_question("top 3 customers  by revenue")
+    assert normalize_question("who sold more than 100.5") == "who sold more than 100.5"
+
+def test_normalize_question_keeps_operators_and_signs():
+    assert normalize_question("sales with revenue > 100") != normalize_question("sales with revenue < 100")
+    assert normalize_question("revenue >= 100") != normalize_question("revenue > 100")
+    assert normalize_question("revenue != 100") != normalize_question("revenue = 100")
+    assert normalize_question("Total customers!") == "total customers"
+    assert normalize_question("regions above -50") != normalize_question("regions above 50")
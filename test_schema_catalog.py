@@ -0,0 +1,84 @@
+import sqlite3
+
+from db_pool import ConnectionPool
+from schema_catalog import SchemaCatalog
+
+def test_catalog_describes_tables(pool):
+    catalog = SchemaCatalog(pool)
+    catalog.refresh()
+    assert sorted(catalog.tables) == ["orders", "sales"]
+    fragment = catalog.fragment("orders")
+    assert fragment.startswith("Table: orders\nColumns: order_id (INTEGER, primary key), customer_name (TEXT")
+    assert "product (TEXT, e.g. '" in fragment
+    assert "Joins: orders.customer_name = sales.customer_name" in fragment
+
+def test_select_tables_ranks_matching_tables_first(pool):
+    catalog = SchemaCatalog(pool)
+    assert catalog.select_tables("who bought monitor")[0] == "orders"
+    assert catalog.select_tables("revenue by region")[0] == "sales"
+    assert catalog.select_tables("hello there") == ["orders", "sales"]  # Nothing matches: every table
+
+def test_prompt_lists_each_join_once(pool):
+    prompt = SchemaCatalog(pool).schema_prompt("hello there")
+    assert prompt.count("customer_name = ") == 1
+    assert prompt.endswith("Joins: orders.customer_name = sales.customer_name\n")
+
+# Eight tables that all have a customer_name column; returns and shipments only meet through orders
+WIDE_SCHEMA = [
+    "create table customers (customer_id integer primary key, customer_name text, segment text)",
+    "create table orders (order_id integer primary key, customer_name text, product text)",
+    "create table sales (id integer primary key, customer_name text, revenue real, region text)",
+    "create table returns (return_id integer primary key, order_id integer references orders (order_id), "
+    "customer_name text, reason text)",
+    "create table shipments (shipment_id integer primary key, order_id integer references orders (order_id), "
+    "customer_name text, carrier text)",
+    "create table leads (lead_id integer primary key, customer_name text, source text)",
+    "create table tickets (ticket_id integer primary key, customer_name text, severity text)",
+    "create table invoices (invoice_id integer primary key, customer_name text, due_date text)",
+]
+
+def test_select_tables_adds_only_join_path_and_referenced_tables(tmp_path):
+    path = str(tmp_path / "wide.db")
+    conn = sqlite3.connect(path)
+    for sql in WIDE_SCHEMA:
+        conn.execute(sql)
+    conn.close()
+    pool = ConnectionPool(path)
+    catalog = SchemaCatalog(pool)
+    assert catalog.select_tables("revenue by region") == ["sales"]
+    assert catalog.select_tables("severity of tickets") == ["tickets"]
+    assert catalog.select_tables("return reasons") == ["returns", "orders"]  # Referenced by a foreign key
+    joins = catalog.schema_prompt("return reasons").splitlines()[-1]
+    assert joins == "Joins: returns.order_id = orders.order_id; orders.customer_name = returns.customer_name"
+    pool.close_all()
+
+def test_select_tables_adds_the_tables_between_matched_tables(tmp_path):
+    path = str(tmp_path / "chain.db")
+    conn = sqlite3.connect(path)
+    conn.execute("create table authors (author_id integer primary key, pen_name text)")
+    conn.execute("create table genres (genre_id integer primary key, label text)")
+    conn.execute("create table books (book_id integer primary key, author_id integer references authors (author_id), "
+                 "genre_id integer references genres (genre_id))")
+    conn.close()
+    pool = ConnectionPool(path)
+    assert SchemaCatalog(pool).select_tables("pen name by label") == ["authors", "genres", "books"]
+    pool.close_all()
+
+def test_catalog_is_rebuilt_only_when_the_schema_changes(scratch_db, add_sale):
+    pool = ConnectionPool(scratch_db)
+    catalog = SchemaCatalog(pool)
+    assert catalog.refresh()
+    add_sale(scratch_db)
+    assert not catalog.refresh()  # Data changed, schema didn't
+    conn = sqlite3.connect(scratch_db)
+    conn.execute("create table returns (return_id integer primary key, order_id integer references orders (order_id))")
+    conn.close()
+    assert catalog.refresh()
+    assert "returns.order_id = orders.order_id" in catalog.fragment("returns")
+    assert catalog.stats()["refreshes"] == 2
+    pool.close_all()
+
+def test_column_types(pool):
+    catalog = SchemaCatalog(pool)
+    sql = "select s.customer_name, s.revenue, sum(o.order_amount) as total from sales s join orders o using (customer_name)"
+    assert catalog.column_types(sql, ["customer_name", "revenue", "total"]) == ["TEXT", "REAL", ""]
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from db_pool import ConnectionPool
+from sql_guard import SQLGuard, table_aliases
+
+@pytest.mark.parametrize("sql", [
+    "delete from sales",
+    "select 1; drop table sales",
+    "pragma table_info(sales)",
+    "",
+])
+def test_guard_rejects_non_select_sql(pool, sql):
+    checked = SQLGuard(pool=pool).validate(sql)
+    assert checked["error_type"] == "rejected"
+
+def test_guard_injects_limit(pool):
+    guard = SQLGuard(pool=pool, max_rows=50)
+    checked = guard.validate("select customer_name from sales;")
+    assert checked["limit_injected"]
+    assert checked["sql"].endswith("limit 51")
+    assert not guard.validate("select customer_name from sales limit 3")["limit_injected"]
+
+def test_guard_check_accepts_keywords_inside_strings(pool):
+    checked = SQLGuard(pool=pool).check("select count(*) from orders where product = 'drop table'")
+    assert "error" not in checked
+
+def test_guard_refuses_expensive_plans(pool):
+    guard = SQLGuard(pool=pool, max_cost=1000)
+    checked = guard.check("select s.customer_name from sales s join orders o on s.revenue = o.order_amount")
+    assert checked["error_type"] == "over_budget"
+    assert SQLGuard(pool=pool).check("select count(*) from sales")["warnings"]
+
+def test_guard_row_counts_from_a_snapshot_are_not_cached(scratch_db, add_sale):
+    pool = ConnectionPool(scratch_db)
+    guard = SQLGuard(pool=pool)
+    with pool.connection() as conn:
+        conn.execute("begin")
+        before = guard._rows(conn, "sales", snapshot=True)
+        add_sale(scratch_db)
+        assert guard._rows(conn, "sales", snapshot=True) == before
+        conn.rollback()
+        assert guard._rows(conn, "sales") == before + 1
+    pool.close_all()
+
+def test_guard_budget_interrupts_long_queries(pool, endless_sql):
+    guard = SQLGuard(pool=pool)
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError, match="interrupted"):
+            with guard.budget(conn, 0.2):
+                conn.execute(endless_sql).fetchone()
+    assert guard.budget_error(0.2)["error_type"] == "over_budget"
+
+def test_table_aliases():
+    assert table_aliases("select s.x from sales s join orders as o on 1 where 'from x' = ''") == {
+        "sales": "sales", "s": "sales", "orders": "orders", "o": "orders"}
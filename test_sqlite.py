@@ -1,6 +1,8 @@
 import sqlite3
 
-conn = sqlite3.connect("combined.db")
+from db_pool import DB_PATH
+
+conn = sqlite3.connect(DB_PATH)
 cursor = conn.cursor()
 
 # Check sales table
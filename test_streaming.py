@@ -0,0 +1,44 @@
+import asyncio
+
+from streaming import StreamExecutor, stream_rows
+
+# Function to run an async generator to the end and collect its frames
+def collect(frames):
+    async def run():
+        return [item async for item in frames]
+    return asyncio.run(run())
+
+def test_stream_rows_in_batches():
+    frames = collect(stream_rows("select id from sales order by id", batch_size=300, max_rows=1000,
+                                 executor=StreamExecutor(max_streams=1)))
+    assert frames[0] == ("columns", ["id"])
+    assert [len(value) for kind, value in frames if kind == "rows"] == [300, 300, 300, 100]
+    assert frames[-1] == ("done", {"row_count": 1000, "truncated": True})
+
+def test_stream_sqlite_errors_become_error_frames():
+    frames = collect(stream_rows("select missing from sales", executor=StreamExecutor(max_streams=1)))
+    assert frames == [("error", {"error": "SQLite Error: no such column: missing"})]
+
+def test_stream_time_budget(endless_sql):
+    frames = collect(stream_rows(endless_sql, time_budget=0.3, executor=StreamExecutor(max_streams=1)))
+    kind, value = frames[-1]
+    assert kind == "error"
+    assert value["error_type"] == "over_budget"
+
+def test_stalled_stream_releases_its_slot():
+    executor = StreamExecutor(max_streams=1, idle_timeout=0.5)
+
+    async def run():
+        frames = stream_rows("select * from sales", batch_size=10, prefetch=1, executor=executor)
+        assert (await frames.__anext__())[0] == "columns"
+        assert not executor.has_capacity()  # The client stops reading here
+        await asyncio.sleep(1.5)
+        assert executor.stats()["active"] == 0
+        kinds = [kind async for kind, _ in frames]
+        assert kinds[-1] == "timeout"
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert stats["rejected"] == 1
+    assert stats["idle_timeouts"] == 1
+    assert executor.has_capacity()